@@ -1,6 +1,10 @@
+import os
 from python_backend.app import create_app
+from python_backend.background import background_enabled
 
-app = create_app()
+# Run directly, the Werkzeug reloader imports this file twice; only its child serves requests
+app = create_app(background=background_enabled(True) and
+                 (__name__ != '__main__' or os.environ.get('WERKZEUG_RUN_MAIN') == 'true'))
 
 if __name__ == "__main__":
     port = 5000
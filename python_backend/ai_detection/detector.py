@@ -1,7 +1,13 @@
 import cv2
 import numpy as np
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Hashable, Optional
 import os
+import queue
+import threading
+import time
+from python_backend.ai_detection.executors import create_executor
+from python_backend.ai_detection.resolution import AdaptiveResolution, downscale
+from python_backend.ai_detection.zones import zone_engine
 
 class AIDetector:
     def __init__(self):
@@ -9,32 +15,141 @@ class AIDetector:
         self.age_ranges = ['0-12', '13-19', '20-35', '36-50', '51-70', '70+']
         self.genders = ['Male', 'Female']
         
-        self.face_cascade = None
+        self.max_workers = int(os.getenv('DETECTION_WORKERS', os.cpu_count() or 1))
+        self.executor_mode = os.getenv('DETECTION_EXECUTOR', 'thread')
+        self.executor = None
+        self.executor_lock = threading.Lock()
+        self.local = threading.local()
+        # Short-lived request threads share a few cascades instead of loading one each
+        self.request_cascades: queue.LifoQueue = queue.LifoQueue()
+        self.request_cascade_limit = max(int(os.getenv('REQUEST_DETECT_CASCADES', 2)), 1)
+        self.request_cascade_count = 0
+        
+        # Detection runs on a downscaled copy; 0 keeps the full source resolution
+        self.detection_width = int(os.getenv('DETECTION_WIDTH', 640))
+        self.resize_mode = os.getenv('DETECTION_RESIZE_MODE', 'resize')
+        self.min_face_size = 30
+        self.adaptive = AdaptiveResolution(
+            self.detection_width,
+            min_width=int(os.getenv('DETECTION_MIN_WIDTH', 160)),
+            budget_ms=float(os.getenv('DETECTION_LATENCY_BUDGET_MS', 0))
+        )
+        
+        self.face_cascade = self._load_cascade()
+        self.local.cascade = self.face_cascade
+    
+    def _load_cascade(self):
         try:
             cascade_path = cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
-            self.face_cascade = cv2.CascadeClassifier(cascade_path)
+            return cv2.CascadeClassifier(cascade_path)
         except Exception as e:
             print(f"Failed to load face cascade: {e}")
+            return None
+    
+    def _get_cascade(self):
+        # CascadeClassifier is not safe to share across threads, so each long-lived worker gets its own
+        if self.face_cascade is None:
+            return None
+        cascade = getattr(self.local, 'cascade', None)
+        if cascade is None:
+            cascade = self._load_cascade()
+            self.local.cascade = cascade
+        return cascade
+    
+    def _borrow_cascade(self):
+        if self.face_cascade is None:
+            return None
+        try:
+            return self.request_cascades.get_nowait()
+        except queue.Empty:
+            pass
+        with self.executor_lock:
+            create = self.request_cascade_count < self.request_cascade_limit
+            if create:
+                self.request_cascade_count += 1
+        # Past the limit, requests wait for a cascade to come back
+        return self._load_cascade() if create else self.request_cascades.get()
+    
+    def detect_request(self, frame: np.ndarray) -> List[Dict]:
+        # For detection on a request thread; the pipeline's workers keep using their per-thread cascades
+        cascade = self._borrow_cascade()
+        try:
+            return self.detect_people(frame, cascade=cascade)
+        finally:
+            if cascade is not None:
+                self.request_cascades.put(cascade)
+    
+    def _get_executor(self):
+        # Created lazily so process-pool workers importing this module never start pools of their own
+        with self.executor_lock:
+            if self.executor is None:
+                self.executor = create_executor(self.executor_mode, self.timed_detect, self.max_workers)
+            return self.executor
+    
+    def set_executor(self, mode: str, max_workers: Optional[int] = None):
+        with self.executor_lock:
+            new_executor = create_executor(mode, self.timed_detect, max_workers or self.max_workers)
+            old_executor, self.executor = self.executor, new_executor
+            self.executor_mode = mode
+            if max_workers:
+                self.max_workers = max_workers
+        if old_executor is not None:
+            old_executor.shutdown()
     
-    def detect_people(self, frame: np.ndarray) -> List[Dict]:
+    def executor_stats(self) -> Dict:
+        with self.executor_lock:
+            executor = self.executor
+        return executor.stats() if executor is not None else {'mode': self.executor_mode, 'started': False}
+    
+    def width_for(self, key: Hashable) -> int:
+        return self.adaptive.width_for(key)
+    
+    def detect_batch(self, frames: Dict[Hashable, np.ndarray],
+                     widths: Optional[Dict[Hashable, int]] = None) -> Dict[Hashable, List[Dict]]:
+        if not frames:
+            return {}
+        
+        # Explicit widths (e.g. for crops) bypass the adaptive controller entirely
+        widths = widths or {}
+        jobs = {key: (frame, widths.get(key, self.adaptive.width_for(key))) for key, frame in frames.items()}
+        results = {}
+        for key, (detections, elapsed) in self._get_executor().run(jobs).items():
+            if key not in widths:
+                self.adaptive.record(key, elapsed)
+            results[key] = detections
+        return results
+    
+    def timed_detect(self, frame: np.ndarray, detection_width: Optional[int] = None) -> Tuple[List[Dict], float]:
+        started = time.perf_counter()
+        detections = self.detect_people(frame, detection_width)
+        return detections, time.perf_counter() - started
+    
+    def detect_people(self, frame: np.ndarray, detection_width: Optional[int] = None, cascade=None) -> List[Dict]:
         if frame is None:
             return []
         
         detections = []
         
-        if self.face_cascade is not None:
+        if cascade is None:
+            cascade = self._get_cascade()
+        if cascade is not None:
             gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            faces = self.face_cascade.detectMultiScale(
-                gray,
+            width = self.detection_width if detection_width is None else detection_width
+            small, scale = downscale(gray, width, self.resize_mode)
+            # 24px is the cascade's native window, so smaller minimums only cost time
+            min_size = max(int(round(self.min_face_size * scale)), 24)
+            faces = cascade.detectMultiScale(
+                small,
                 scaleFactor=1.1,
                 minNeighbors=5,
-                minSize=(30, 30)
+                minSize=(min_size, min_size)
             )
             
             for idx, (x, y, w, h) in enumerate(faces):
                 person = {
                     'tracking_id': f'person_{idx}',
-                    'bbox': {'x': int(x), 'y': int(y), 'width': int(w), 'height': int(h)},
+                    'bbox': {'x': int(x / scale), 'y': int(y / scale),
+                             'width': int(w / scale), 'height': int(h / scale)},
                     'confidence': self.confidence_threshold,
                     'gender': np.random.choice(self.genders),
                     'age_range': np.random.choice(self.age_ranges),
@@ -66,27 +181,9 @@ class AIDetector:
         
         return demographics
     
-    def track_zone_activity(self, frame: np.ndarray, zones: List[Dict]) -> Dict:
-        detections = self.detect_people(frame)
-        zone_activity = {}
-        
-        for zone in zones:
-            zone_id = zone.get('id')
-            people_in_zone = 0
-            
-            for detection in detections:
-                bbox = detection.get('bbox', {})
-                person_center_x = bbox.get('x', 0) + bbox.get('width', 0) // 2
-                person_center_y = bbox.get('y', 0) + bbox.get('height', 0) // 2
-                
-                people_in_zone += 1
-            
-            zone_activity[zone_id] = {
-                'count': people_in_zone,
-                'capacity_usage': (people_in_zone / zone.get('capacity', 50)) * 100
-            }
-        
-        return zone_activity
+    def track_zone_activity(self, detections: List[Dict], camera_index: int,
+                            frame_shape: Tuple[int, ...]) -> Dict:
+        return zone_engine.assign(camera_index, detections, frame_shape)
     
     def detect_suspicious_activity(self, detections: List[Dict]) -> List[Dict]:
         alerts = []
@@ -0,0 +1,173 @@
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+import numpy as np
+
+EXECUTOR_MODES = ('inline', 'thread', 'process')
+
+# A job is a frame plus the width to detect at; a result is the detections plus seconds spent
+Job = Tuple[np.ndarray, Optional[int]]
+Result = Tuple[List[Dict], float]
+DetectFn = Callable[[np.ndarray, Optional[int]], Result]
+
+class InlineExecutor:
+    mode = 'inline'
+
+    def __init__(self, detect_fn: DetectFn):
+        self.detect_fn = detect_fn
+
+    def run(self, jobs: Dict[Hashable, Job]) -> Dict[Hashable, Result]:
+        return {key: self.detect_fn(frame, width) for key, (frame, width) in jobs.items()}
+
+    def stats(self) -> Dict:
+        return {'mode': self.mode}
+
+    def shutdown(self):
+        pass
+
+class ThreadPoolDetectionExecutor(InlineExecutor):
+    mode = 'thread'
+
+    def __init__(self, detect_fn: DetectFn, max_workers: int):
+        super().__init__(detect_fn)
+        self.max_workers = max_workers
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='detector')
+
+    def run(self, jobs: Dict[Hashable, Job]) -> Dict[Hashable, Result]:
+        if len(jobs) <= 1:
+            return super().run(jobs)
+
+        futures = {key: self.pool.submit(self.detect_fn, frame, width) for key, (frame, width) in jobs.items()}
+        return _collect(futures)
+
+    def stats(self) -> Dict:
+        return {'mode': self.mode, 'workers': self.max_workers}
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+class ProcessPoolDetectionExecutor:
+    mode = 'process'
+
+    def __init__(self, max_workers: int):
+        # spawn keeps capture threads and open VideoCaptures out of the workers
+        self.context = multiprocessing.get_context(os.getenv('DETECTION_MP_START', 'spawn'))
+        self.max_workers = max_workers
+        self.pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=self.context)
+        self.segments: Dict[Hashable, shared_memory.SharedMemory] = {}
+        self.lock = threading.Lock()
+        self.restarts = 0
+        self.restarted_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    def _segment_for(self, key: Hashable, nbytes: int) -> shared_memory.SharedMemory:
+        segment = self.segments.get(key)
+        if segment is None or segment.size < nbytes:
+            if segment is not None:
+                segment.close()
+                segment.unlink()
+            segment = shared_memory.SharedMemory(create=True, size=nbytes)
+            self.segments[key] = segment
+        return segment
+
+    def _release_segments(self):
+        for segment in self.segments.values():
+            segment.close()
+            segment.unlink()
+        self.segments.clear()
+
+    def _restart(self, error: BrokenProcessPool):
+        # A dead worker breaks the pool for good; every later submit would fail, so start over with a fresh
+        # pool and fresh segments. This tick's detections are lost, the next one runs normally
+        print(f"Detection process pool broke ({error}), restarting")
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        self._release_segments()
+        self.pool = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=self.context)
+        self.restarts += 1
+        self.restarted_at = time.time()
+        self.last_error = str(error) or 'A worker process terminated abruptly'
+
+    def run(self, jobs: Dict[Hashable, Job]) -> Dict[Hashable, Result]:
+        with self.lock:
+            futures = {}
+            try:
+                for key, (frame, width) in jobs.items():
+                    if frame is None:
+                        continue
+                    segment = self._segment_for(key, frame.nbytes)
+                    np.ndarray(frame.shape, dtype=frame.dtype, buffer=segment.buf)[...] = frame
+                    futures[key] = self.pool.submit(_detect_shared, segment.name, frame.shape, frame.dtype.str, width)
+                results = _collect(futures)
+            except BrokenProcessPool as e:
+                self._restart(e)
+                results = {}
+            for key in jobs:
+                results.setdefault(key, ([], 0.0))
+            return results
+
+    def stats(self) -> Dict:
+        return {
+            'mode': self.mode,
+            'workers': self.max_workers,
+            'restarts': self.restarts,
+            'restartedAt': self.restarted_at,
+            'lastError': self.last_error
+        }
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        with self.lock:
+            self._release_segments()
+
+def _collect(futures: Dict) -> Dict[Hashable, Result]:
+    results = {}
+    for key, future in futures.items():
+        try:
+            results[key] = future.result()
+        except BrokenProcessPool:
+            raise
+        except Exception as e:
+            print(f"Detection failed for {key}: {e}")
+            results[key] = ([], 0.0)
+    return results
+
+_attached: 'OrderedDict[str, shared_memory.SharedMemory]' = OrderedDict()
+_MAX_ATTACHED = 64
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    segment = _attached.get(name)
+    if segment is None:
+        segment = shared_memory.SharedMemory(name=name)
+        _attached[name] = segment
+        while len(_attached) > _MAX_ATTACHED:
+            _, stale = _attached.popitem(last=False)
+            stale.close()
+    else:
+        _attached.move_to_end(name)
+    return segment
+
+def _detect_shared(name: str, shape: Tuple[int, ...], dtype: str, width: Optional[int]) -> Result:
+    from python_backend.ai_detection.detector import detector
+
+    segment = _attach(name)
+    frame = np.ndarray(shape, dtype=np.dtype(dtype), buffer=segment.buf)
+    result = detector.timed_detect(frame, width)
+    del frame
+    return result
+
+def create_executor(mode: Optional[str], detect_fn: DetectFn, max_workers: int):
+    mode = (mode or 'thread').lower()
+    if mode not in EXECUTOR_MODES:
+        raise ValueError(f"Unknown detection executor '{mode}', expected one of {EXECUTOR_MODES}")
+
+    if mode == 'process':
+        return ProcessPoolDetectionExecutor(max_workers)
+    if mode == 'thread' and max_workers > 1:
+        return ThreadPoolDetectionExecutor(detect_fn, max_workers)
+    return InlineExecutor(detect_fn)
@@ -0,0 +1,86 @@
+import os
+import threading
+import time
+from typing import Dict, Hashable, List, Optional, Tuple
+import cv2
+import numpy as np
+
+Region = Tuple[int, int, int, int]
+
+class MotionGate:
+    def __init__(self, width: int = 64, pixel_threshold: Optional[int] = None,
+                 min_changed_ratio: Optional[float] = None, refresh_seconds: Optional[float] = None,
+                 max_regions: int = 4, full_frame_ratio: float = 0.5):
+        self.enabled = os.getenv('MOTION_GATE', '1') != '0'
+        self.width = width
+        self.pixel_threshold = int(pixel_threshold or os.getenv('MOTION_PIXEL_THRESHOLD', 25))
+        self.min_changed_ratio = float(min_changed_ratio or os.getenv('MOTION_MIN_CHANGED_RATIO', 0.002))
+        self.refresh_seconds = float(refresh_seconds or os.getenv('MOTION_REFRESH_SECONDS', 10))
+        self.max_regions = max_regions
+        self.full_frame_ratio = full_frame_ratio
+        self.previous: Dict[Hashable, np.ndarray] = {}
+        self.last_full: Dict[Hashable, float] = {}
+        self.skipped: Dict[Hashable, int] = {}
+        self.lock = threading.Lock()
+
+    def _thumbnail(self, frame: np.ndarray) -> np.ndarray:
+        height, width = frame.shape[:2]
+        small = cv2.resize(frame, (self.width, max(int(height * self.width / width), 1)), interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(small, (3, 3), 0)
+
+    def check(self, key: Hashable, frame: np.ndarray) -> Tuple[bool, Optional[List[Region]]]:
+        # Returns (run_detection, regions); regions None means detect on the whole frame
+        if not self.enabled:
+            return True, None
+
+        thumbnail = self._thumbnail(frame)
+        now = time.monotonic()
+
+        with self.lock:
+            previous = self.previous.get(key)
+            self.previous[key] = thumbnail
+            if previous is None or previous.shape != thumbnail.shape or now - self.last_full.get(key, 0.0) >= self.refresh_seconds:
+                self.last_full[key] = now
+                return True, None
+
+            mask = cv2.threshold(cv2.absdiff(previous, thumbnail), self.pixel_threshold, 255, cv2.THRESH_BINARY)[1]
+            changed = cv2.countNonZero(mask)
+            if changed < self.min_changed_ratio * mask.size:
+                self.skipped[key] = self.skipped.get(key, 0) + 1
+                return False, None
+
+            if changed > self.full_frame_ratio * mask.size:
+                self.last_full[key] = now
+                return True, None
+
+        return True, self._regions(mask, frame.shape[1] / mask.shape[1], frame.shape[:2])
+
+    def _regions(self, mask: np.ndarray, scale: float, frame_shape: Tuple[int, int]) -> Optional[List[Region]]:
+        mask = cv2.dilate(mask, np.ones((3, 3), np.uint8), iterations=2)
+        count, _, boxes, _ = cv2.connectedComponentsWithStats(mask)
+        if count - 1 > self.max_regions:
+            return None
+
+        height, width = frame_shape
+        # Pad so a face partly outside the moving blob is still fully inside the crop
+        pad = int(3 * scale)
+        regions = []
+        for x, y, w, h, _ in boxes[1:]:
+            x1 = max(int(x * scale) - pad, 0)
+            y1 = max(int(y * scale) - pad, 0)
+            x2 = min(int((x + w) * scale) + pad, width)
+            y2 = min(int((y + h) * scale) + pad, height)
+            regions.append((x1, y1, x2 - x1, y2 - y1))
+        return regions
+
+    def reset(self, key: Hashable):
+        with self.lock:
+            self.previous.pop(key, None)
+            self.last_full.pop(key, None)
+            self.skipped.pop(key, None)
+
+    def stats(self) -> Dict[Hashable, int]:
+        with self.lock:
+            return dict(self.skipped)
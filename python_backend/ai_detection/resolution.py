@@ -0,0 +1,68 @@
+import threading
+from typing import Dict, Hashable, Optional, Tuple
+import cv2
+import numpy as np
+
+RESIZE_MODES = ('resize', 'pyramid')
+
+def downscale(image: np.ndarray, target_width: Optional[int], mode: str = 'resize') -> Tuple[np.ndarray, float]:
+    height, width = image.shape[:2]
+    if not target_width or width <= target_width:
+        return image, 1.0
+
+    if mode == 'pyramid':
+        # Halve with pyrDown while still at least twice the target, then finish with one resize
+        while image.shape[1] // 2 >= target_width:
+            image = cv2.pyrDown(image)
+        if image.shape[1] > target_width:
+            scale = target_width / image.shape[1]
+            image = cv2.resize(image, (target_width, max(int(image.shape[0] * scale), 1)),
+                               interpolation=cv2.INTER_AREA)
+    else:
+        scale = target_width / width
+        image = cv2.resize(image, (target_width, max(int(height * scale), 1)), interpolation=cv2.INTER_AREA)
+
+    return image, image.shape[1] / width
+
+class AdaptiveResolution:
+    def __init__(self, max_width: int, min_width: int = 160, budget_ms: float = 0.0, smoothing: float = 0.3):
+        self.max_width = max_width
+        self.min_width = min(min_width, max_width) if max_width else min_width
+        self.budget = budget_ms / 1000.0
+        self.smoothing = smoothing
+        self.widths: Dict[Hashable, int] = {}
+        self.latencies: Dict[Hashable, float] = {}
+        self.lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.budget > 0 and bool(self.max_width)
+
+    def width_for(self, key: Hashable) -> int:
+        if not self.enabled:
+            return self.max_width
+        with self.lock:
+            return self.widths.get(key, self.max_width)
+
+    def record(self, key: Hashable, elapsed: float):
+        if not self.enabled:
+            return
+
+        with self.lock:
+            previous = self.latencies.get(key, elapsed)
+            latency = previous + self.smoothing * (elapsed - previous)
+            self.latencies[key] = latency
+            width = self.widths.get(key, self.max_width)
+
+            if latency > self.budget and width > self.min_width:
+                width = max(int(width * 0.75), self.min_width)
+                self.latencies[key] = latency * 0.75
+            elif latency < self.budget * 0.5 and width < self.max_width:
+                width = min(int(width * 1.25), self.max_width)
+            self.widths[key] = width
+
+    def stats(self) -> Dict[Hashable, Dict]:
+        with self.lock:
+            return {key: {'width': self.widths.get(key, self.max_width),
+                          'latencyMs': round(self.latencies.get(key, 0.0) * 1000, 1)}
+                    for key in set(self.widths) | set(self.latencies)}
@@ -0,0 +1,201 @@
+import itertools
+import os
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional
+import numpy as np
+
+# State is [cx, cy, w, h, vcx, vcy, vw, vh] with a constant-velocity model, one step per processed frame
+_F = np.eye(8)
+_F[:4, 4:] = np.eye(4)
+_Q = np.diag([1.0, 1.0, 1.0, 1.0, 0.5, 0.5, 0.25, 0.25])
+_R = np.diag([4.0, 4.0, 10.0, 10.0])
+_P0 = np.diag([10.0, 10.0, 10.0, 10.0, 100.0, 100.0, 100.0, 100.0])
+
+# Unique per process, so processes started in the same second never share tracking ids
+SESSION = format(int(time.time()), 'x') + uuid.uuid4().hex[:6]
+
+def _to_boxes(detections: List[Dict]) -> np.ndarray:
+    if not detections:
+        return np.zeros((0, 4))
+    return np.array([[d['bbox']['x'], d['bbox']['y'], d['bbox']['width'], d['bbox']['height']]
+                     for d in detections], dtype=np.float64)
+
+def _boxes_to_state(boxes: np.ndarray) -> np.ndarray:
+    centers = boxes[:, :2] + boxes[:, 2:] / 2
+    return np.hstack([centers, boxes[:, 2:]])
+
+def iou_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    # a and b are (N, 4) / (M, 4) arrays of x, y, w, h
+    if len(a) == 0 or len(b) == 0:
+        return np.zeros((len(a), len(b)))
+    ax1, ay1 = a[:, 0:1], a[:, 1:2]
+    ax2, ay2 = ax1 + a[:, 2:3], ay1 + a[:, 3:4]
+    bx1, by1 = b[:, 0], b[:, 1]
+    bx2, by2 = bx1 + b[:, 2], by1 + b[:, 3]
+    inter_w = np.clip(np.minimum(ax2, bx2) - np.maximum(ax1, bx1), 0, None)
+    inter_h = np.clip(np.minimum(ay2, by2) - np.maximum(ay1, by1), 0, None)
+    inter = inter_w * inter_h
+    union = a[:, 2:3] * a[:, 3:4] + b[:, 2] * b[:, 3] - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-9), 0.0)
+
+def greedy_match(scores: np.ndarray, threshold: float):
+    matches = []
+    if scores.size == 0:
+        return matches
+    rows, cols = np.unravel_index(np.argsort(-scores, axis=None), scores.shape)
+    used_rows, used_cols = set(), set()
+    for row, col in zip(rows, cols):
+        if scores[row, col] < threshold:
+            break
+        if row in used_rows or col in used_cols:
+            continue
+        used_rows.add(row)
+        used_cols.add(col)
+        matches.append((int(row), int(col)))
+    return matches
+
+class MultiObjectTracker:
+    def __init__(self, camera_index: int, iou_threshold: float = 0.3, max_age: Optional[int] = None,
+                 min_hits: Optional[int] = None):
+        self.camera_index = camera_index
+        self.iou_threshold = iou_threshold
+        self.max_age = int(max_age or os.getenv('TRACKER_MAX_AGE', 10))
+        # A track is reported only after this many matched detections, so one-frame false positives never surface
+        self.min_hits = max(int(min_hits or os.getenv('TRACKER_MIN_HITS', 3)), 1)
+        self.counter = itertools.count(1)
+        self.states = np.zeros((0, 8))
+        self.covariances = np.zeros((0, 8, 8))
+        self.ids: List[int] = []
+        self.attributes: List[Dict] = []
+        self.misses = np.zeros(0, dtype=np.int64)
+        self.hits = np.zeros(0, dtype=np.int64)
+        self.confirmed = np.zeros(0, dtype=bool)
+        # Tracks confirmed and ended by the most recent update()
+        self.started: List[Dict] = []
+        self.ended: List[Dict] = []
+
+    def _predict(self):
+        if not self.ids:
+            return
+        self.states = self.states @ _F.T
+        # Keep width/height positive when a shrinking velocity coasts for too long
+        self.states[:, 2:4] = np.maximum(self.states[:, 2:4], 1.0)
+        self.covariances = _F @ self.covariances @ _F.T + _Q
+
+    def _correct(self, track_rows: np.ndarray, boxes: np.ndarray):
+        measurements = _boxes_to_state(boxes)
+        P = self.covariances[track_rows]
+        S = P[:, :4, :4] + _R
+        K = P[:, :, :4] @ np.linalg.inv(S)
+        innovation = measurements - self.states[track_rows, :4]
+        self.states[track_rows] += np.einsum('nij,nj->ni', K, innovation)
+        self.covariances[track_rows] = P - K @ P[:, :4, :]
+
+    def _spawn(self, boxes: np.ndarray, detections: List[Dict]):
+        count = len(boxes)
+        states = np.zeros((count, 8))
+        states[:, :4] = _boxes_to_state(boxes)
+        self.states = np.vstack([self.states, states])
+        self.covariances = np.concatenate([self.covariances, np.repeat(_P0[None], count, axis=0)])
+        self.misses = np.concatenate([self.misses, np.zeros(count, dtype=np.int64)])
+        self.hits = np.concatenate([self.hits, np.ones(count, dtype=np.int64)])
+        self.confirmed = np.concatenate([self.confirmed, np.zeros(count, dtype=bool)])
+        for det in detections:
+            self.ids.append(next(self.counter))
+            # Attributes are fixed when the track is born so they stop flickering between frames
+            self.attributes.append({
+                'confidence': det.get('confidence'),
+                'gender': det.get('gender'),
+                'age_range': det.get('age_range'),
+                'is_staff': det.get('is_staff', False)
+            })
+
+    def _prune(self) -> List[Dict]:
+        alive = self.misses <= self.max_age
+        if alive.all():
+            return []
+        boxes = self.current_boxes()
+        # Tentative tracks were never reported, so they end silently
+        ended = [self._describe(row, boxes) for row in np.flatnonzero(~alive & self.confirmed)]
+        self.states = self.states[alive]
+        self.covariances = self.covariances[alive]
+        self.misses = self.misses[alive]
+        self.hits = self.hits[alive]
+        self.confirmed = self.confirmed[alive]
+        self.ids = [tid for tid, keep in zip(self.ids, alive) if keep]
+        self.attributes = [attr for attr, keep in zip(self.attributes, alive) if keep]
+        return ended
+
+    def update(self, detections: List[Dict]) -> List[Dict]:
+        self._predict()
+        boxes = _to_boxes(detections)
+        matches = greedy_match(iou_matrix(self.current_boxes(), boxes), self.iou_threshold)
+
+        matched_tracks = np.array([m[0] for m in matches], dtype=np.int64)
+        matched_dets = np.array([m[1] for m in matches], dtype=np.int64)
+        self.misses += 1
+        if len(matches):
+            self._correct(matched_tracks, boxes[matched_dets])
+            self.misses[matched_tracks] = 0
+            self.hits[matched_tracks] += 1
+
+        unmatched = np.setdiff1d(np.arange(len(boxes)), matched_dets)
+        if len(unmatched):
+            self._spawn(boxes[unmatched], [detections[i] for i in unmatched])
+        newly = (self.hits >= self.min_hits) & ~self.confirmed
+        self.confirmed |= newly
+        born = {tid for tid, new in zip(self.ids, newly) if new}
+
+        self.ended = self._prune()
+        tracks = self.tracks()
+        self.started = [track for track in tracks if track['track_id'] in born]
+        return tracks
+
+    def end_all(self) -> List[Dict]:
+        # Ends every live track at once, e.g. when the camera goes away; returns the confirmed ones
+        self.misses[:] = self.max_age + 1
+        self.started, self.ended = [], self._prune()
+        return self.ended
+
+    def predict(self) -> List[Dict]:
+        # Coast every track one frame without a detection; used between full detections
+        self._predict()
+        self.started, self.ended = [], []
+        return self.tracks()
+
+    def current_boxes(self) -> np.ndarray:
+        if not self.ids:
+            return np.zeros((0, 4))
+        centers, sizes = self.states[:, :2], self.states[:, 2:4]
+        return np.hstack([centers - sizes / 2, sizes])
+
+    def _describe(self, row: int, boxes: np.ndarray) -> Dict:
+        x, y, w, h = boxes[row]
+        track_id = self.ids[row]
+        return dict(self.attributes[row],
+                    tracking_id=f'c{self.camera_index}-{SESSION}-{track_id}',
+                    track_id=track_id,
+                    bbox={'x': int(x), 'y': int(y), 'width': int(w), 'height': int(h)})
+
+    def tracks(self) -> List[Dict]:
+        boxes = self.current_boxes()
+        return [self._describe(row, boxes) for row in np.flatnonzero(self.confirmed)]
+
+class TrackerRegistry:
+    def __init__(self):
+        self.trackers: Dict[int, MultiObjectTracker] = {}
+        self.lock = threading.Lock()
+
+    def get(self, camera_index: int) -> MultiObjectTracker:
+        with self.lock:
+            tracker = self.trackers.get(camera_index)
+            if tracker is None:
+                tracker = MultiObjectTracker(camera_index)
+                self.trackers[camera_index] = tracker
+            return tracker
+
+    def reset(self, camera_index: int) -> Optional[MultiObjectTracker]:
+        with self.lock:
+            return self.trackers.pop(camera_index, None)
@@ -0,0 +1,108 @@
+import json
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+
+def parse_polygon(value) -> Optional[List[List[float]]]:
+    # Polygons are lists of [x, y] in frame-relative coordinates (0..1), stored as JSON text
+    if value is None or value == '':
+        return None
+    points = json.loads(value) if isinstance(value, str) else value
+    if not isinstance(points, list) or len(points) < 3:
+        raise ValueError('Zone polygon needs at least 3 points')
+    polygon = []
+    for point in points:
+        if not isinstance(point, (list, tuple)) or len(point) != 2:
+            raise ValueError('Zone polygon points must be [x, y] pairs')
+        x, y = float(point[0]), float(point[1])
+        if not (0.0 <= x <= 1.0 and 0.0 <= y <= 1.0):
+            raise ValueError('Zone polygon coordinates must be between 0 and 1')
+        polygon.append([x, y])
+    return polygon
+
+class CameraZones:
+    def __init__(self, zones: List[Dict]):
+        self.zone_ids = [z['id'] for z in zones]
+        self.capacities = np.array([z.get('capacity') or 50 for z in zones], dtype=np.float64)
+        self.whole_frame = np.array([z.get('polygon') is None for z in zones], dtype=bool)
+
+        # All polygon edges back to back, with the offset where each zone's edges start
+        starts, x1, y1, x2, y2 = [], [], [], [], []
+        for zone in zones:
+            starts.append(len(x1))
+            polygon = zone.get('polygon') or []
+            for i, (ax, ay) in enumerate(polygon):
+                bx, by = polygon[(i + 1) % len(polygon)]
+                x1.append(ax); y1.append(ay); x2.append(bx); y2.append(by)
+        self.starts = np.array(starts, dtype=np.int64)
+        self.x1, self.y1 = np.array(x1), np.array(y1)
+        self.x2, self.y2 = np.array(x2), np.array(y2)
+        self.has_edges = np.diff(np.append(self.starts, len(x1))) > 0
+
+    def contains(self, points: np.ndarray) -> np.ndarray:
+        # Even-odd ray casting for every point against every zone at once; returns (points, zones)
+        inside = np.repeat(self.whole_frame[None, :], len(points), axis=0)
+        if len(points) == 0 or len(self.x1) == 0:
+            return inside
+
+        px, py = points[:, 0:1], points[:, 1:2]
+        straddles = (self.y1 > py) != (self.y2 > py)
+        dy = np.where(self.y2 == self.y1, 1e-12, self.y2 - self.y1)
+        crossing_x = (self.x2 - self.x1) * (py - self.y1) / dy + self.x1
+        crossings = (straddles & (px < crossing_x)).astype(np.int64)
+
+        starts = self.starts[self.has_edges]
+        counts = np.add.reduceat(crossings, starts, axis=1)
+        inside[:, self.has_edges] = counts % 2 == 1
+        return inside
+
+class ZoneOccupancyEngine:
+    def __init__(self):
+        self.cameras: Dict[Optional[int], CameraZones] = {}
+        self.lock = threading.Lock()
+
+    def load(self, zones: Iterable):
+        grouped: Dict[int, List[Dict]] = {}
+        for zone in zones:
+            data = zone if isinstance(zone, dict) else {
+                'id': zone.id,
+                'capacity': zone.capacity,
+                'camera_index': zone.camera_index,
+                'polygon': zone.polygon
+            }
+            if data.get('camera_index') is None:
+                continue
+            try:
+                data = dict(data, polygon=parse_polygon(data.get('polygon')))
+            except (ValueError, TypeError) as e:
+                print(f"Ignoring invalid polygon for zone {data.get('id')}: {e}")
+                continue
+            grouped.setdefault(data['camera_index'], []).append(data)
+
+        with self.lock:
+            self.cameras = {camera_index: CameraZones(items) for camera_index, items in grouped.items()}
+
+    def assign(self, camera_index: int, detections: List[Dict],
+               frame_shape: Tuple[int, ...]) -> Dict[int, Dict]:
+        with self.lock:
+            zones = self.cameras.get(camera_index)
+        if zones is None:
+            return {}
+
+        height, width = frame_shape[:2]
+        if detections:
+            boxes = np.array([[d['bbox']['x'], d['bbox']['y'], d['bbox']['width'], d['bbox']['height']]
+                              for d in detections], dtype=np.float64)
+            points = (boxes[:, :2] + boxes[:, 2:] / 2) / np.array([width, height], dtype=np.float64)
+        else:
+            points = np.zeros((0, 2))
+
+        inside = zones.contains(points)
+        counts = inside.sum(axis=0)
+        for det, row in zip(detections, inside):
+            det['zone_ids'] = [zones.zone_ids[i] for i in np.flatnonzero(row)]
+
+        return {zone_id: {'count': int(count), 'capacity_usage': float(count / capacity * 100)}
+                for zone_id, count, capacity in zip(zones.zone_ids, counts, zones.capacities)}
+
+zone_engine = ZoneOccupancyEngine()
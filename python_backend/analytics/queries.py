@@ -0,0 +1,60 @@
+from datetime import datetime
+from typing import Dict
+from sqlalchemy import Integer, func, select
+from python_backend.analytics.rollups import AGE_COLUMNS
+from python_backend.config.database import db
+from python_backend.models.models import Customer, Visit, ZoneStats
+
+# Single-statement aggregates over raw visits; each returns plain rows, never ORM entities
+
+def occupancy_stats(start: datetime) -> Dict:
+    stmt = select(
+        select(func.count(Visit.id))
+        .where(Visit.entry_time >= start, Visit.exit_time.is_(None))
+        .scalar_subquery().label('current_occupancy'),
+        select(func.avg(ZoneStats.visitor_count))
+        .where(ZoneStats.date >= start)
+        .scalar_subquery().label('zone_engagement')
+    )
+    return dict(db.session.execute(stmt).one()._mapping)
+
+def overview_stats(start: datetime, end: datetime) -> Dict:
+    visits = select(
+        func.count(Visit.id).label('total_visitors'),
+        func.count(Visit.id).filter(Visit.exit_time.is_(None)).label('current_occupancy'),
+        func.avg(Visit.total_dwell_time).label('avg_dwell_time')
+    ).where(Visit.entry_time >= start, Visit.entry_time < end).subquery()
+    engagement = select(func.avg(ZoneStats.visitor_count)).where(ZoneStats.date >= start).scalar_subquery()
+
+    stmt = select(visits, engagement.label('zone_engagement'))
+    return dict(db.session.execute(stmt).one()._mapping)
+
+def hourly_traffic(start: datetime, end: datetime) -> Dict[int, int]:
+    hour = func.extract('hour', Visit.entry_time).cast(Integer)
+    stmt = (
+        select(hour, func.count(Visit.id))
+        .where(Visit.entry_time >= start, Visit.entry_time < end)
+        .group_by(hour)
+    )
+    return {int(h): int(count) for h, count in db.session.execute(stmt)}
+
+def demographics(start: datetime, end: datetime) -> Dict:
+    # Visits in the range, the same unit the hourly rollups count, so ?source=raw agrees with them.
+    # Distinct customers cannot be summed across hourly buckets; a returning customer counts once per visit
+    visit_count = lambda condition: func.count(Visit.id).filter(condition)
+    columns = [
+        visit_count(Customer.gender == 'Male').label('male'),
+        visit_count(Customer.gender == 'Female').label('female')
+    ] + [visit_count(Customer.age_range == age).label(column) for age, column in AGE_COLUMNS.items()]
+    stmt = (
+        select(*columns)
+        .select_from(Visit)
+        .join(Customer, Customer.id == Visit.customer_id)
+        .where(Visit.entry_time >= start, Visit.entry_time < end)
+    )
+    row = db.session.execute(stmt).one()._mapping
+    return {
+        'male': int(row['male']),
+        'female': int(row['female']),
+        'age_distribution': {age: int(row[column]) for age, column in AGE_COLUMNS.items()}
+    }
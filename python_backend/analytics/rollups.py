@@ -0,0 +1,169 @@
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import Integer, case, delete, func, insert, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from python_backend.config.database import db
+from python_backend.models.models import Customer, StoreHourlyStats, Visit, ZoneStats
+
+AGE_COLUMNS = {
+    '0-12': 'age_0_12',
+    '13-19': 'age_13_19',
+    '20-35': 'age_20_35',
+    '36-50': 'age_36_50',
+    '51-70': 'age_51_70',
+    '70+': 'age_70_plus'
+}
+STORE_COUNTERS = ['visitor_count', 'dwell_sum', 'dwell_count', 'male', 'female'] + list(AGE_COLUMNS.values())
+
+def hour_bucket(moment: datetime) -> datetime:
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+def day_range(day: Optional[datetime] = None) -> Tuple[datetime, datetime]:
+    day = day or datetime.utcnow()
+    start = datetime.combine(day.date(), datetime.min.time())
+    return start, start + timedelta(days=1)
+
+class RollupEngine:
+    def __init__(self, max_open: int = 100000):
+        # Entry times of open visits / zone stays, so dwell can be rolled up when they end
+        self.entry_times: Dict[str, datetime] = {}
+        self.zone_entries: Dict[Tuple[str, int], datetime] = {}
+        self.max_open = max_open
+        self.lock = threading.Lock()
+
+    def apply_events(self, events: List[Dict]):
+        # Runs inside the event writer's transaction; every event already carries a datetime in 'time'
+        store: Dict[datetime, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        zones: Dict[Tuple[int, datetime], Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+
+        with self.lock:
+            for event in events:
+                action, moment, tracking_id = event['action'], event['time'], event['trackingId']
+                if action == 'enter':
+                    self.entry_times[tracking_id] = moment
+                    counters = store[hour_bucket(moment)]
+                    counters['visitor_count'] += 1
+                    if event.get('gender') == 'Male':
+                        counters['male'] += 1
+                    elif event.get('gender') == 'Female':
+                        counters['female'] += 1
+                    if event.get('ageRange') in AGE_COLUMNS:
+                        counters[AGE_COLUMNS[event['ageRange']]] += 1
+                elif action == 'exit':
+                    entered = self.entry_times.pop(tracking_id, None)
+                    if entered is not None:
+                        counters = store[hour_bucket(entered)]
+                        counters['dwell_sum'] += int((moment - entered).total_seconds())
+                        counters['dwell_count'] += 1
+                elif action == 'zone_enter' and event.get('zoneId') is not None:
+                    self.zone_entries[(tracking_id, event['zoneId'])] = moment
+                    zones[(event['zoneId'], hour_bucket(moment))]['visitor_count'] += 1
+                elif action == 'zone_exit' and event.get('zoneId') is not None:
+                    entered = self.zone_entries.pop((tracking_id, event['zoneId']), None)
+                    if entered is not None:
+                        counters = zones[(event['zoneId'], hour_bucket(entered))]
+                        counters['dwell_sum'] += int((moment - entered).total_seconds())
+                        counters['dwell_count'] += 1
+            self._expire_open()
+
+        for bucket, counters in store.items():
+            self._apply_store(bucket, counters)
+        for (zone_id, bucket), counters in zones.items():
+            self._apply_zone(zone_id, bucket, counters)
+
+    def _expire_open(self):
+        # Exits lost to dropped events would otherwise pin entries forever
+        if len(self.entry_times) + len(self.zone_entries) <= self.max_open:
+            return
+        cutoff = datetime.utcnow() - timedelta(days=1)
+        self.entry_times = {k: v for k, v in self.entry_times.items() if v >= cutoff}
+        self.zone_entries = {k: v for k, v in self.zone_entries.items() if v >= cutoff}
+
+    def _apply_store(self, bucket: datetime, counters: Dict[str, int]):
+        values = {column: counters.get(column, 0) for column in STORE_COUNTERS}
+        stmt = pg_insert(StoreHourlyStats).values(bucket=bucket, **values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[StoreHourlyStats.bucket],
+            set_={column: getattr(StoreHourlyStats, column) + getattr(stmt.excluded, column)
+                  for column in STORE_COUNTERS}
+        )
+        db.session.execute(stmt)
+
+    def _apply_zone(self, zone_id: int, bucket: datetime, counters: Dict[str, int]):
+        visitors = counters.get('visitor_count', 0)
+        dwell_sum, dwell_count = counters.get('dwell_sum', 0), counters.get('dwell_count', 0)
+        samples = func.coalesce(ZoneStats.dwell_samples, 0)
+        average = func.coalesce(ZoneStats.avg_dwell_time, 0)
+
+        result = db.session.execute(
+            update(ZoneStats)
+            .where(ZoneStats.zone_id == zone_id, ZoneStats.date == bucket)
+            .values(
+                visitor_count=func.coalesce(ZoneStats.visitor_count, 0) + visitors,
+                avg_dwell_time=case(
+                    (samples + dwell_count > 0,
+                     ((average * samples + dwell_sum) / (samples + dwell_count)).cast(Integer)),
+                    else_=average
+                ),
+                dwell_samples=samples + dwell_count
+            )
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 0:
+            db.session.execute(insert(ZoneStats).values(
+                zone_id=zone_id,
+                date=bucket,
+                hour=bucket.hour,
+                visitor_count=visitors,
+                avg_dwell_time=dwell_sum // dwell_count if dwell_count else 0,
+                dwell_samples=dwell_count
+            ))
+
+def rebuild_store_rollups(start: datetime, end: datetime, conn=None):
+    # Recomputes store buckets from raw visits, e.g. after seeding or for rows written outside the pipeline.
+    # Runs on the session and commits, or inside the caller's transaction when given a connection
+    start = hour_bucket(start)
+    end = hour_bucket(end) + timedelta(hours=1) if end != hour_bucket(end) else end
+    bucket = func.date_trunc('hour', Visit.entry_time)
+    gender_count = lambda gender: func.count(Visit.id).filter(Customer.gender == gender)
+    source = (
+        select(
+            bucket,
+            func.count(Visit.id),
+            func.coalesce(func.sum(Visit.total_dwell_time), 0),
+            func.count(Visit.total_dwell_time),
+            gender_count('Male'),
+            gender_count('Female'),
+            *[func.count(Visit.id).filter(Customer.age_range == age) for age in AGE_COLUMNS]
+        )
+        .join(Customer, Customer.id == Visit.customer_id)
+        .where(Visit.entry_time >= start, Visit.entry_time < end)
+        .group_by(bucket)
+    )
+
+    executor = conn if conn is not None else db.session
+    executor.execute(delete(StoreHourlyStats).where(StoreHourlyStats.bucket >= start, StoreHourlyStats.bucket < end))
+    executor.execute(insert(StoreHourlyStats).from_select(['bucket'] + STORE_COUNTERS, source))
+    if conn is None:
+        db.session.commit()
+
+def backfill_store_rollups(conn):
+    # Visits recorded before the rollups existed: rebuilds every hour up to and including the first one
+    # the event writer rolled up, which may hold only the visits written after the switch
+    first_visit = conn.execute(select(func.min(Visit.entry_time))).scalar()
+    if first_visit is None:
+        return
+    first_rollup = conn.execute(select(func.min(StoreHourlyStats.bucket))).scalar()
+    end = first_rollup + timedelta(hours=1) if first_rollup is not None else datetime.utcnow()
+    if first_visit < end:
+        rebuild_store_rollups(first_visit, end, conn)
+
+def store_rollups(start: datetime, end: datetime) -> List[StoreHourlyStats]:
+    return db.session.query(StoreHourlyStats).filter(
+        StoreHourlyStats.bucket >= start,
+        StoreHourlyStats.bucket < end
+    ).order_by(StoreHourlyStats.bucket).all()
+
+rollup_engine = RollupEngine()
@@ -1,5 +1,6 @@
 import os
 import sys
+from typing import Optional
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
@@ -9,13 +10,17 @@ from python_backend.config.database import init_db
 from python_backend.routes.api_routes import api_bp
 from python_backend.routes.camera_routes import camera_bp
 from python_backend.routes.websocket_routes import init_websocket
+from python_backend.background import background_enabled, background_services
 
-def create_app():
+def create_app(background: Optional[bool] = None):
+    # Camera capture, detection and event writing are opt-in (BACKGROUND_SERVICES=1 or background=True),
+    # so web workers, scripts and the reloader parent stay out; among the processes that opt in, only the
+    # one holding the database lock runs them
     build_path = os.path.join(os.path.dirname(__file__), '..', 'dist', 'public')
     build_path = os.path.abspath(build_path)
     app = Flask(__name__, static_folder=build_path, static_url_path=None)
     
-    CORS(app, resources={r"/api/*": {"origins": "*"}, r"/ws/*": {"origins": "*"}})
+    CORS(app, resources={r"/api/*": {"origins": "*"}, r"/ws/*": {"origins": "*"}}, expose_headers=["X-Next-Cursor"])
     
     init_db(app)
     
@@ -24,18 +29,17 @@ def create_app():
     
     init_websocket(app)
     
-    from python_backend.models.models import Camera
-    from python_backend.camera import camera_manager
+    from python_backend.models.models import Zone
     from python_backend.config.database import db as database
+    from python_backend.ai_detection.zones import zone_engine
     
     with app.app_context():
-        cameras = database.session.query(Camera).filter_by(status='active').all()
-        for camera in cameras:
-            try:
-                camera_manager.add_camera(camera.camera_index, camera.rtsp_url)
-                print(f"Loaded camera: {camera.name} (index: {camera.camera_index})")
-            except Exception as e:
-                print(f"Failed to load camera {camera.name}: {e}")
+        zone_engine.load(database.session.query(Zone).all())
+    
+    # Cameras open concurrently in the background, so one unreachable URL cannot hold up startup;
+    # until then they are listed with health state 'connecting'
+    if background_enabled(False) if background is None else background:
+        background_services.start(app)
     
     @app.route('/', defaults={'path': ''})
     @app.route('/<path:path>')
@@ -54,6 +58,7 @@ def create_app():
     return app
 
 if __name__ == '__main__':
-    app = create_app()
+    # debug=True runs this file again in a reloader child; only the child serves, so only it runs the services
+    app = create_app(background=background_enabled(True) and os.environ.get('WERKZEUG_RUN_MAIN') == 'true')
     port = int(os.getenv('PORT', 5000))
     app.run(host='0.0.0.0', port=port, debug=True)
@@ -0,0 +1,211 @@
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Optional asyncio runtime: pip install starlette uvicorn a2wsgi, then
+#   uvicorn python_backend.asgi:app --host 0.0.0.0 --port 5000
+# (or python python_backend/asgi.py). REST keeps running as the Flask app from create_app on a fixed
+# WSGI worker pool; MJPEG streams and detection WebSockets are coroutines, and cameras are captured on
+# a fixed pool of CAPTURE_WORKERS threads. The thread count no longer grows with cameras or viewers.
+
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Mount, Route, WebSocketRoute
+from starlette.websockets import WebSocket, WebSocketDisconnect
+from python_backend.app import create_app
+from python_backend.background import background_enabled
+from python_backend.camera import camera_manager, detection_pipeline, result_hub, stream_encoders
+from python_backend.camera.stream_encoder import CameraStreamEncoder, EncodedFrame
+from python_backend.ai_detection.tracker import SESSION
+from python_backend.routes.ws_protocol import SUBPROTOCOLS, hello
+from python_backend.routes.websocket_routes import open_session, render, status_message
+
+CAPTURE_WORKERS = int(os.getenv('CAPTURE_WORKERS', 8))
+STREAM_WORKERS = int(os.getenv('STREAM_WORKERS', 4))
+WSGI_WORKERS = int(os.getenv('WSGI_WORKERS', 16))
+
+camera_manager.use_capture_pool(CAPTURE_WORKERS)
+stream_pool = ThreadPoolExecutor(STREAM_WORKERS, thread_name_prefix='stream')
+
+class FrameFeed:
+    # One pump task per (camera, profile) with viewers runs the shared encoder on the stream pool
+    # and wakes every viewer coroutine when a new JPEG is ready
+    def __init__(self, encoder: CameraStreamEncoder):
+        self.encoder = encoder
+        self.latest: Optional[EncodedFrame] = None
+        self.updated = asyncio.Event()
+        self.viewers = 0
+        self.pump: Optional[asyncio.Task] = None
+
+    def active(self) -> bool:
+        return self.viewers > 0 and camera_manager.is_camera_active(self.encoder.camera_index)
+
+    async def _pump(self):
+        loop = asyncio.get_running_loop()
+        seq = 0
+        try:
+            while self.active():
+                # Pace here rather than inside next_frame, so no pool thread sits in a sleep
+                if self.latest is not None:
+                    wait = self.latest.encoded_at + self.encoder.interval - time.monotonic()
+                    if wait > 0:
+                        await asyncio.sleep(wait)
+                encoded = await loop.run_in_executor(stream_pool, self.encoder.next_frame, seq, 1.0)
+                if encoded is not None:
+                    seq = encoded.seq
+                    self.latest = encoded
+                event, self.updated = self.updated, asyncio.Event()
+                event.set()
+        finally:
+            self.pump = None
+
+    async def frames(self):
+        self.viewers += 1
+        with self.encoder.condition:
+            self.encoder.viewers += 1
+        try:
+            last_seq = 0
+            while self.active():
+                if self.pump is None:
+                    self.pump = asyncio.create_task(self._pump())
+                updated = self.updated
+                latest = self.latest
+                if latest is None or latest.seq <= last_seq:
+                    try:
+                        await asyncio.wait_for(updated.wait(), timeout=5.0)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                last_seq = latest.seq
+                yield latest
+        finally:
+            self.viewers -= 1
+            with self.encoder.condition:
+                self.encoder.viewers -= 1
+
+feeds: Dict[Tuple[int, str], FrameFeed] = {}
+
+def frame_feed(camera_index: int, profile: Optional[str]) -> FrameFeed:
+    encoder = stream_encoders.get(camera_index, profile)
+    key = (camera_index, encoder.profile)
+    feed = feeds.get(key)
+    # The registry swaps encoders when a camera restarts; the feed follows
+    if feed is None or feed.encoder is not encoder:
+        feed = feeds[key] = FrameFeed(encoder)
+    return feed
+
+async def stream_camera(request):
+    camera_index = request.path_params['camera_index']
+    if not camera_manager.is_camera_active(camera_index):
+        return JSONResponse({'error': 'Camera not active'}, status_code=404)
+    try:
+        feed = frame_feed(camera_index, request.query_params.get('profile'))
+    except ValueError as e:
+        return JSONResponse({'error': str(e)}, status_code=400)
+
+    async def generate():
+        async for encoded in feed.frames():
+            yield (b'--frame\r\n'
+                   b'Content-Type: image/jpeg\r\n\r\n' + encoded.jpeg + b'\r\n')
+
+    return StreamingResponse(generate(), media_type='multipart/x-mixed-replace; boundary=frame')
+
+async def camera_websocket(websocket: WebSocket):
+    # Same protocol as routes/websocket_routes.py, waiting on the result hub without holding a thread
+    camera_index = websocket.path_params['camera_index']
+    subprotocol = next((p for p in websocket.scope.get('subprotocols') or [] if p in SUBPROTOCOLS), None)
+    await websocket.accept(subprotocol=subprotocol)
+
+    async def send(message):
+        if isinstance(message, bytes):
+            await websocket.send_bytes(message)
+        else:
+            await websocket.send_text(message)
+
+    loop = asyncio.get_running_loop()
+    ready = asyncio.Event()
+    closed = asyncio.Event()
+    subscription = None
+
+    async def watch_disconnect():
+        # Clients send nothing, but delta protocols may not send for a while either;
+        # reading is how a departed client gets noticed and unsubscribed
+        try:
+            while (await websocket.receive())['type'] != 'websocket.disconnect':
+                pass
+        finally:
+            closed.set()
+            ready.set()
+
+    watcher = asyncio.create_task(watch_disconnect())
+    try:
+        if not camera_manager.is_camera_active(camera_index):
+            await send(status_message(camera_index, f'Camera {camera_index} not available'))
+            return
+        try:
+            profile, encoder, max_fps = open_session(websocket.query_params, subprotocol)
+        except ValueError as e:
+            await send(status_message(camera_index, str(e)))
+            return
+        interval = 1.0 / max_fps
+        await send(hello(encoder, camera_index, profile, max_fps, SESSION))
+
+        # Publishes arrive on the pipeline thread; an already-set event needs no second wake-up
+        subscription = result_hub.subscribe(
+            camera_index, notify=lambda: ready.is_set() or loop.call_soon_threadsafe(ready.set))
+        current = detection_pipeline.get_result(camera_index)
+        if current is not None:
+            subscription.put(current)
+
+        last_sent = 0.0
+        while not closed.is_set() and camera_manager.is_camera_active(camera_index):
+            wait = last_sent + interval - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+
+            ready.clear()
+            result = subscription.get(timeout=0, latest=True)
+            if result is None:
+                try:
+                    await asyncio.wait_for(ready.wait(), timeout=3.0)
+                except asyncio.TimeoutError:
+                    await send(status_message(camera_index, 'Waiting for frame'))
+                continue
+            if closed.is_set():
+                break
+
+            message = render(result, encoder, profile)
+            if message is None:
+                continue
+            await send(message)
+            last_sent = time.monotonic()
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        print(f"WebSocket error: {e}")
+    finally:
+        watcher.cancel()
+        if subscription is not None:
+            result_hub.unsubscribe(subscription)
+        try:
+            await websocket.close()
+        except Exception:
+            pass
+
+flask_app = create_app(background=background_enabled(True))
+
+app = Starlette(routes=[
+    Route('/api/cameras/{camera_index:int}/stream', stream_camera),
+    WebSocketRoute('/ws/camera/{camera_index:int}', camera_websocket),
+    Mount('/', app=WSGIMiddleware(flask_app, workers=WSGI_WORKERS))
+])
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(app, host='0.0.0.0', port=int(os.getenv('PORT', 5000)))
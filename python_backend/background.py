@@ -0,0 +1,158 @@
+import os
+import threading
+from typing import Dict, Optional
+from sqlalchemy import text
+from python_backend.config.database import db
+
+# Any bigint shared by every process of one deployment; advisory locks are per database
+LOCK_KEY = int(os.getenv('BACKGROUND_LOCK_KEY', 7152001))
+CHECK_SECONDS = float(os.getenv('BACKGROUND_CHECK_SECONDS', 5))
+
+def background_enabled(default: bool) -> bool:
+    # BACKGROUND_SERVICES=1/0 overrides the entry point's default
+    value = os.getenv('BACKGROUND_SERVICES')
+    return default if value is None else value != '0'
+
+def stop_camera(camera_index: int):
+    from python_backend.camera import camera_manager, detection_pipeline, stream_encoders
+    # Capture first, so no later detection tick picks the camera up again
+    camera_manager.remove_camera(camera_index)
+    detection_pipeline.stop(camera_index)
+    stream_encoders.reset(camera_index)
+
+class BackgroundServices:
+    # Camera capture, detection, event writing and partition maintenance must run in one process per
+    # database: every process running them would capture the same cameras and write its own visits.
+    # The process holding a Postgres advisory lock runs them; the others stand by and take over once the
+    # holder's session ends. The holder applies camera rows saved by any process.
+    def __init__(self):
+        self.app = None
+        self.engine = None
+        self.connection = None
+        self.active = False
+        self.listening = False
+        self.thread: Optional[threading.Thread] = None
+        self.stopped = threading.Event()
+        self.lock = threading.RLock()
+
+    def start(self, app):
+        if self.thread is not None and self.thread.is_alive():
+            return
+        self.app = app
+        with app.app_context():
+            self.engine = db.engine
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        with self.lock:
+            if self.active:
+                self._stop_services()
+            self._release()
+
+    def _run(self):
+        while True:
+            try:
+                with self.lock:
+                    if self._hold_lock():
+                        if not self.active:
+                            self._start_services()
+                        self.sync_cameras()
+                    elif self.active:
+                        self._stop_services()
+            except Exception as e:
+                print(f"Background services check failed: {e}")
+            if self.stopped.wait(CHECK_SECONDS):
+                return
+
+    def _hold_lock(self) -> bool:
+        # Session-level lock on a dedicated autocommit connection: held for as long as that connection lives
+        if self.connection is not None:
+            try:
+                self.connection.execute(text('SELECT 1'))
+                return True
+            except Exception as e:
+                print(f"Lost the background services lock: {e}")
+                self._release()
+        connection = self.engine.connect().execution_options(isolation_level='AUTOCOMMIT')
+        try:
+            if connection.execute(text('SELECT pg_try_advisory_lock(:key)'), {'key': LOCK_KEY}).scalar():
+                self.connection = connection
+                return True
+        except Exception:
+            connection.close()
+            raise
+        connection.close()
+        return False
+
+    def _release(self):
+        if self.connection is not None:
+            try:
+                self.connection.close()
+            except Exception:
+                pass
+            self.connection = None
+
+    def _start_services(self):
+        from python_backend.camera import detection_pipeline
+        from python_backend.ingestion.event_writer import event_writer
+        from python_backend.config.partitions import partition_maintainer
+
+        if os.getenv('EVENT_WRITER', '1') != '0':
+            event_writer.start(self.app)
+            if not self.listening:
+                detection_pipeline.add_listener(event_writer.on_result)
+                self.listening = True
+            # Events are recorded for every active camera, not only the ones someone is watching
+            detection_pipeline.start()
+        if os.getenv('PARTITION_MAINTENANCE', '1') != '0':
+            partition_maintainer.start(self.engine)
+        self.active = True
+        print(f"Running camera capture, detection and event writing in this process (pid {os.getpid()})")
+
+    def _stop_services(self):
+        from python_backend.camera import camera_manager, detection_pipeline
+        from python_backend.ingestion.event_writer import event_writer
+        from python_backend.config.partitions import partition_maintainer
+
+        self.active = False
+        for camera_index in list(camera_manager.cameras):
+            stop_camera(camera_index)
+        detection_pipeline.stop()
+        event_writer.stop()
+        partition_maintainer.stop()
+        print(f"Stopped camera capture, detection and event writing in this process (pid {os.getpid()})")
+
+    def sync_cameras(self):
+        # Brings the captures in line with the active camera rows: connects new ones, stops removed or
+        # deactivated ones, restarts those whose URL changed and applies analytics rates. No-op on standby.
+        from python_backend.camera import camera_manager
+        from python_backend.models.models import Camera
+
+        with self.lock:
+            if not self.active:
+                return
+            with self.app.app_context():
+                wanted = {c.camera_index: (c.capture_url, c.analytics_fps, c.name)
+                          for c in db.session.query(Camera).filter_by(status='active').all()}
+            for camera_index in list(camera_manager.cameras):
+                health = camera_manager.health.get(camera_index)
+                if camera_index not in wanted or (health is not None and health.source != wanted[camera_index][0]):
+                    stop_camera(camera_index)
+            for camera_index, (capture_url, analytics_fps, name) in wanted.items():
+                if camera_index in camera_manager.cameras:
+                    camera_manager.set_analytics_fps(camera_index, analytics_fps)
+                    continue
+                camera_manager.connect_camera(camera_index, capture_url, analytics_fps)
+                print(f"Connecting camera: {name} (index: {camera_index})")
+
+    def stats(self) -> Dict:
+        return {
+            'enabled': self.thread is not None and self.thread.is_alive(),
+            'active': self.active,
+            'pid': os.getpid()
+        }
+
+background_services = BackgroundServices()
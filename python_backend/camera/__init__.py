@@ -1,3 +1,6 @@
 from python_backend.camera.camera_manager import camera_manager
+from python_backend.camera.detection_pipeline import detection_pipeline
+from python_backend.camera.stream_encoder import stream_encoders, STREAM_PROFILES
+from python_backend.camera.result_hub import result_hub
 
-__all__ = ['camera_manager']
+__all__ = ['camera_manager', 'detection_pipeline', 'stream_encoders', 'STREAM_PROFILES', 'result_hub']
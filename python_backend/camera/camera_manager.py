@@ -1,105 +1,465 @@
 import cv2
+import os
+import socket
 import threading
 import time
-from typing import Dict, Optional
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Dict, List, Optional, Set, Tuple
+from urllib.parse import urlsplit
 import numpy as np
+from python_backend.camera.frame_buffer import FrameRing
+from python_backend.camera.health import CameraHealth
+
+RETRY_SECONDS = 0.1
+SUPERVISOR_INTERVAL = float(os.getenv('CAMERA_SUPERVISOR_SECONDS', 1))
+
+# grab  grab() every frame to keep the stream drained, retrieve() only at the camera's analytics fps.
+#       FFmpeg still decodes every frame inside grab(); retrieve() is the colour conversion and copy out of
+#       the decoder (or the download from a hardware decoder), and that is the work this rate limits
+# read  read() and keep every frame, the previous behaviour
+CAPTURE_MODE = os.getenv('CAPTURE_MODE', 'grab')
+# Default analytics rate keeps STREAM_MAX_FPS live views smooth; analytics-only cameras can go down to DETECTION_FPS
+ANALYTICS_FPS = float(os.getenv('CAPTURE_ANALYTICS_FPS', os.getenv('CAPTURE_DECODE_FPS', 15)))
+TEST_WORKERS = int(os.getenv('CAMERA_TEST_WORKERS', 32))
+OPEN_TIMEOUT_MS = int(os.getenv('CAPTURE_OPEN_TIMEOUT_MS', 10000))
+READ_TIMEOUT_MS = int(os.getenv('CAPTURE_READ_TIMEOUT_MS', 5000))
+HW_ACCELERATION_MODES = {
+    'none': cv2.VIDEO_ACCELERATION_NONE,
+    'any': cv2.VIDEO_ACCELERATION_ANY,
+    'vaapi': cv2.VIDEO_ACCELERATION_VAAPI,
+    'd3d11': cv2.VIDEO_ACCELERATION_D3D11,
+    'mfx': cv2.VIDEO_ACCELERATION_MFX,
+}
+HW_ACCELERATION_MODE = os.getenv('CAPTURE_HW_ACCELERATION', 'none').lower()
+if HW_ACCELERATION_MODE not in HW_ACCELERATION_MODES:
+    print(f"Unknown CAPTURE_HW_ACCELERATION '{HW_ACCELERATION_MODE}', expected one of "
+          f"{tuple(HW_ACCELERATION_MODES)}; decoding in software")
+    HW_ACCELERATION_MODE = 'none'
+HW_ACCELERATION = HW_ACCELERATION_MODES[HW_ACCELERATION_MODE]
+
+# Read by OpenCV's FFmpeg backend on every open: RTSP over TCP (no smeared frames from UDP loss),
+# no input buffering and low-delay decoding, so grabbed frames are as fresh as the network allows
+os.environ.setdefault('OPENCV_FFMPEG_CAPTURE_OPTIONS',
+                      'rtsp_transport;tcp|fflags;nobuffer|flags;low_delay|max_delay;500000|buffer_size;1048576')
+
+DEFAULT_PORTS = {'rtsp': 554, 'rtsps': 322, 'http': 80, 'https': 443}
+
+def preflight(url: str, timeout: float) -> Optional[str]:
+    # OpenCV's FFmpeg backend opens one stream at a time per process, so an unreachable camera would hold
+    # every other open for its whole timeout. A plain socket check fails those in parallel instead.
+    parts = urlsplit(url)
+    if parts.scheme not in DEFAULT_PORTS:
+        return None
+    if not parts.hostname:
+        return 'Invalid camera URL'
+    port = parts.port or DEFAULT_PORTS[parts.scheme]
+    try:
+        with socket.create_connection((parts.hostname, port), timeout=timeout) as sock:
+            if parts.scheme == 'rtsp':
+                # Any RTSP reply, 401 included, shows the server is up; credentials stay out of the request
+                target = parts._replace(netloc=f'{parts.hostname}:{port}').geturl()
+                sock.sendall(f'OPTIONS {target} RTSP/1.0\r\nCSeq: 1\r\n\r\n'.encode())
+                if not sock.recv(16).startswith(b'RTSP/'):
+                    return 'No RTSP response'
+    except OSError as e:
+        return f'Unreachable: {e}'
+    return None
 
 class CameraManager:
-    def __init__(self):
-        self.cameras: Dict[int, cv2.VideoCapture] = {}
+    def __init__(self, ring_slots: Optional[int] = None, capture_workers: Optional[int] = None):
+        # None while a camera's first open is still pending
+        self.cameras: Dict[int, Optional[cv2.VideoCapture]] = {}
         self.camera_threads: Dict[int, threading.Thread] = {}
-        self.camera_frames: Dict[int, np.ndarray] = {}
-        self.camera_locks: Dict[int, threading.Lock] = {}
+        self.frame_rings: Dict[int, FrameRing] = {}
         self.running: Dict[int, bool] = {}
-        
-    def add_camera(self, camera_index: int, rtsp_url: Optional[str] = None) -> bool:
+        self.ring_slots = int(ring_slots or os.getenv('FRAME_RING_SLOTS', 4))
+        # CAPTURE_WORKERS=0 keeps one capture thread per camera; N > 0 shares N pool threads between all cameras
+        self.capture_workers = int(capture_workers or os.getenv('CAPTURE_WORKERS', 0))
+        self.capture_pool: Optional[ThreadPoolExecutor] = None
+        self.dispatcher: Optional[threading.Thread] = None
+        self.capture_condition = threading.Condition()
+        self.capture_locks: Dict[int, threading.Lock] = {}
+        self.in_flight: Set[int] = set()
+        self.retry_at: Dict[int, float] = {}
+        self.health: Dict[int, CameraHealth] = {}
+        self.retrieve_intervals: Dict[int, float] = {}
+        self.next_retrieve_at: Dict[int, float] = {}
+        self.supervisor: Optional[threading.Thread] = None
+        self.test_pool: Optional[ThreadPoolExecutor] = None
+    
+    def use_capture_pool(self, workers: int):
+        # Must be called before the first camera is added
+        if self.cameras:
+            raise RuntimeError('Capture mode cannot change while cameras are running')
+        self.capture_workers = workers
+
+    def add_camera(self, camera_index: int, rtsp_url: Optional[str] = None, analytics_fps: Optional[float] = None) -> bool:
         if camera_index in self.cameras:
             return True
             
         try:
-            if rtsp_url:
-                cap = cv2.VideoCapture(rtsp_url)
-            else:
-                cap = cv2.VideoCapture(camera_index)
-            
-            if not cap.isOpened():
+            cap = self._open(camera_index, rtsp_url)
+            if cap is None:
                 return False
-                
-            self.cameras[camera_index] = cap
-            self.camera_locks[camera_index] = threading.Lock()
-            self.running[camera_index] = True
-            
-            thread = threading.Thread(target=self._capture_frames, args=(camera_index,), daemon=True)
-            thread.start()
-            self.camera_threads[camera_index] = thread
-            
+            self._register(camera_index, rtsp_url, analytics_fps, cap)
             return True
         except Exception as e:
             print(f"Error adding camera {camera_index}: {e}")
             return False
     
-    def _capture_frames(self, camera_index: int):
-        cap = self.cameras.get(camera_index)
-        if not cap:
-            return
-            
-        while self.running.get(camera_index, False):
-            ret, frame = cap.read()
-            if ret:
-                with self.camera_locks[camera_index]:
-                    self.camera_frames[camera_index] = frame.copy()
-            else:
-                time.sleep(0.1)
+    def connect_camera(self, camera_index: int, rtsp_url: Optional[str] = None, analytics_fps: Optional[float] = None):
+        # Returns at once: the camera's capture worker opens the stream, bounded by CAPTURE_OPEN_TIMEOUT_MS,
+        # and keeps retrying with backoff. Cameras report 'connecting' until their first open succeeds.
+        if camera_index not in self.cameras:
+            self._register(camera_index, rtsp_url, analytics_fps, None)
     
-    def get_frame(self, camera_index: int) -> Optional[np.ndarray]:
-        if camera_index not in self.camera_frames:
+    def _register(self, camera_index: int, rtsp_url: Optional[str], analytics_fps: Optional[float],
+                  cap: Optional[cv2.VideoCapture]):
+        # The health object doubles as this registration's token: workers of an earlier registration of the
+        # same index, still blocked in an open or read remove_camera gave up waiting on, see it replaced and exit
+        health = CameraHealth(rtsp_url, 'live' if cap is not None else 'connecting')
+        self.frame_rings[camera_index] = FrameRing(self.ring_slots)
+        self.capture_locks[camera_index] = threading.Lock()
+        with self.capture_condition:
+            self.health[camera_index] = health
+            self.running[camera_index] = True
+            self.cameras[camera_index] = cap
+        self.set_analytics_fps(camera_index, analytics_fps)
+        self._start_supervisor()
+        
+        if self.capture_workers > 0:
+            self._start_dispatcher()
+            with self.capture_condition:
+                self.capture_condition.notify()
+        else:
+            thread = threading.Thread(target=self._capture_frames, args=(camera_index, health), daemon=True)
+            thread.start()
+            self.camera_threads[camera_index] = thread
+    
+    def set_analytics_fps(self, camera_index: int, analytics_fps: Optional[float] = None):
+        # None falls back to CAPTURE_ANALYTICS_FPS; 0 retrieves every frame the camera sends
+        fps = ANALYTICS_FPS if analytics_fps is None else float(analytics_fps)
+        self.retrieve_intervals[camera_index] = 1.0 / fps if fps > 0 else 0.0
+    
+    def _open(self, camera_index: int, rtsp_url: Optional[str],
+              timeout_ms: Optional[int] = None) -> Optional[cv2.VideoCapture]:
+        if rtsp_url:
+            error = preflight(rtsp_url, (timeout_ms or OPEN_TIMEOUT_MS) / 1000)
+            if error:
+                raise ConnectionError(error)
+            # Timeouts turn a dead stream into a failed open or read instead of a capture blocked for minutes
+            cap = cv2.VideoCapture(rtsp_url, cv2.CAP_FFMPEG, [
+                cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, timeout_ms or OPEN_TIMEOUT_MS,
+                cv2.CAP_PROP_READ_TIMEOUT_MSEC, timeout_ms or READ_TIMEOUT_MS,
+                cv2.CAP_PROP_HW_ACCELERATION, HW_ACCELERATION
+            ])
+        else:
+            cap = cv2.VideoCapture(camera_index)
+            # Local devices queue frames in the driver; keep only the newest
+            cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        if not cap.isOpened():
+            cap.release()
             return None
+        return cap
+    
+    def _current_capture(self, camera_index: int, health: CameraHealth) -> Tuple[bool, Optional[cv2.VideoCapture]]:
+        # Whether health's registration is still the current one, and its capture if so
+        with self.capture_condition:
+            if self.health.get(camera_index) is not health:
+                return False, None
+            return True, self.cameras.get(camera_index)
+    
+    def _capture_step(self, camera_index: int, health: CameraHealth) -> float:
+        # Reads one frame into the camera's ring, or reopens a stalled capture;
+        # returns how long to wait before the next step
+        lock = self.capture_locks.get(camera_index)
+        if lock is None:
+            return 0.0
+        with lock:
+            ring = self.frame_rings.get(camera_index)
+            current, cap = self._current_capture(camera_index, health)
+            if not ring or not current:
+                return 0.0
+            if health.state != 'live' or health.stalled():
+                return self._reconnect(camera_index, health)
+            if CAPTURE_MODE == 'read':
+                return self._read(camera_index, cap, ring, health)
             
-        with self.camera_locks.get(camera_index, threading.Lock()):
-            return self.camera_frames[camera_index].copy()
+            started = time.monotonic()
+            if not cap.grab():
+                health.record_drop()
+                return RETRY_SECONDS
+            grabbed = time.monotonic()
+            health.record_grab(grabbed - started)
+            
+            interval = self.retrieve_intervals.get(camera_index, 0.0)
+            due = self.next_retrieve_at.get(camera_index, 0.0)
+            if interval and grabbed < due:
+                health.record_skip()
+                return 0.0
+            # Keeps the average rate on target even though frames only arrive at the camera's own cadence
+            self.next_retrieve_at[camera_index] = max(due + interval, grabbed - interval)
+            
+            # Retrieve straight into the next ring slot; OpenCV reallocates only if the size changed
+            slot = ring.write_slot()
+            ret, frame = cap.retrieve(slot) if slot is not None else cap.retrieve()
+            if not ret:
+                health.record_drop()
+                return RETRY_SECONDS
+            ring.commit(frame, time.time())
+            health.record_frame(time.monotonic() - grabbed)
+            return 0.0
+    
+    def _read(self, camera_index: int, cap: cv2.VideoCapture, ring: FrameRing, health: CameraHealth) -> float:
+        started = time.monotonic()
+        slot = ring.write_slot()
+        ret, frame = cap.read(slot) if slot is not None else cap.read()
+        if not ret:
+            health.record_drop()
+            return RETRY_SECONDS
+        elapsed = time.monotonic() - started
+        ring.commit(frame, time.time())
+        health.record_grab(elapsed)
+        health.record_frame(elapsed)
+        return 0.0
+    
+    def _reconnect(self, camera_index: int, health: CameraHealth) -> float:
+        # Called with the camera's capture lock held
+        wait = health.next_attempt_at - time.monotonic()
+        if wait > 0:
+            return wait
+        if health.state != 'connecting':
+            health.state = 'reconnecting'
+        current, stale = self._current_capture(camera_index, health)
+        if not current:
+            return 0.0
+        if stale is not None:
+            stale.release()
+        error = 'Could not open capture'
+        try:
+            cap = self._open(camera_index, health.source)
+        except Exception as e:
+            cap, error = None, str(e)
+        if cap is None:
+            delay = health.reconnect_failed(error)
+            print(f"Camera {camera_index} {'reconnect' if health.connected else 'connect'} failed ({error}), retrying in {delay:g}s")
+            return delay
+        with self.capture_condition:
+            # The open can outlast remove_camera's wait; never install a capture into a later registration
+            current = self.health.get(camera_index) is health
+            if current:
+                self.cameras[camera_index] = cap
+        if not current:
+            cap.release()
+            return 0.0
+        print(f"Camera {camera_index} {'reconnected' if health.connected else 'connected'}")
+        health.reconnected()
+        return 0.0
+    
+    def _capture_frames(self, camera_index: int, health: CameraHealth):
+        while self.health.get(camera_index) is health:
+            delay = self._capture_step(camera_index, health)
+            if delay > 0:
+                health.stopped.wait(delay)
+    
+    def _start_supervisor(self):
+        with self.capture_condition:
+            if self.supervisor is None:
+                self.supervisor = threading.Thread(target=self._supervise, daemon=True)
+                self.supervisor.start()
+    
+    def _supervise(self):
+        # Flags stalls even while a capture sits blocked inside read(); the capture worker reopens the
+        # stream once it gets control back, and stalled cameras stop counting as active meanwhile
+        while True:
+            time.sleep(SUPERVISOR_INTERVAL)
+            for camera_index, health in list(self.health.items()):
+                if health.tick():
+                    print(f"Camera {camera_index} stalled: {health.last_error}")
+    
+    def _start_dispatcher(self):
+        with self.capture_condition:
+            if self.dispatcher is not None:
+                return
+            self.capture_pool = ThreadPoolExecutor(self.capture_workers, thread_name_prefix='capture')
+            self.dispatcher = threading.Thread(target=self._dispatch, daemon=True)
+            self.dispatcher.start()
+    
+    def _dispatch(self):
+        # Keeps at most one step per camera queued on the pool, so cameras take turns on the workers
+        # and the thread count stays fixed however many cameras are added
+        while True:
+            with self.capture_condition:
+                now = time.monotonic()
+                idle = [i for i in list(self.cameras) if self.running.get(i, False) and i not in self.in_flight]
+                ready = [i for i in idle if self.retry_at.get(i, 0.0) <= now]
+                if not ready:
+                    retries = [self.retry_at[i] for i in idle if i in self.retry_at]
+                    self.capture_condition.wait(min(retries) - now if retries else None)
+                    continue
+                self.in_flight.update(ready)
+                tokens = [(i, self.health.get(i)) for i in ready]
+            try:
+                for camera_index, health in tokens:
+                    self.capture_pool.submit(self._pooled_step, camera_index, health)
+            except RuntimeError:
+                # The pool refuses work once the interpreter is shutting down
+                return
+    
+    def _pooled_step(self, camera_index: int, health: Optional[CameraHealth]):
+        delay = RETRY_SECONDS
+        try:
+            delay = self._capture_step(camera_index, health) if health is not None else 0.0
+        except Exception as e:
+            print(f"Capture error on camera {camera_index}: {e}")
+        finally:
+            with self.capture_condition:
+                self.in_flight.discard(camera_index)
+                if delay > 0:
+                    self.retry_at[camera_index] = time.monotonic() + delay
+                else:
+                    self.retry_at.pop(camera_index, None)
+                self.capture_condition.notify()
+    
+    def get_frame(self, camera_index: int) -> Optional[np.ndarray]:
+        _, _, frame = self.get_frame_if_newer(camera_index, 0)
+        return frame
+    
+    def get_frame_view(self, camera_index: int) -> Tuple[int, float, Optional[np.ndarray]]:
+        ring = self.frame_rings.get(camera_index)
+        if ring is None:
+            return 0, 0.0, None
+        return ring.latest()
+    
+    def get_frame_if_newer(self, camera_index: int, after_seq: int) -> Tuple[int, float, Optional[np.ndarray]]:
+        ring = self.frame_rings.get(camera_index)
+        if ring is None:
+            return 0, 0.0, None
+        return ring.copy_if_newer(after_seq)
+    
+    def wait_for_frame(self, camera_index: int, after_seq: int = 0,
+                       timeout: Optional[float] = None) -> Tuple[int, float, Optional[np.ndarray]]:
+        ring = self.frame_rings.get(camera_index)
+        if ring is None:
+            return 0, 0.0, None
+        return ring.wait_newer(after_seq, timeout)
     
     def remove_camera(self, camera_index: int) -> bool:
         if camera_index not in self.cameras:
             return False
             
-        self.running[camera_index] = False
+        with self.capture_condition:
+            self.running[camera_index] = False
+            health = self.health.pop(camera_index, None)
+        if health is not None:
+            health.stopped.set()
+        self.retrieve_intervals.pop(camera_index, None)
+        self.next_retrieve_at.pop(camera_index, None)
+        
+        if camera_index in self.frame_rings:
+            self.frame_rings[camera_index].close()
         
         if camera_index in self.camera_threads:
             self.camera_threads[camera_index].join(timeout=2.0)
             del self.camera_threads[camera_index]
         
+        # A pooled step may still be reading; wait for it before releasing the capture
+        lock = self.capture_locks.pop(camera_index, None)
+        acquired = lock.acquire(timeout=2.0) if lock else False
+        with self.capture_condition:
+            self.retry_at.pop(camera_index, None)
+        
         if camera_index in self.cameras:
-            self.cameras[camera_index].release()
+            if self.cameras[camera_index] is not None:
+                self.cameras[camera_index].release()
             del self.cameras[camera_index]
         
-        if camera_index in self.camera_frames:
-            del self.camera_frames[camera_index]
+        if camera_index in self.frame_rings:
+            del self.frame_rings[camera_index]
         
-        if camera_index in self.camera_locks:
-            del self.camera_locks[camera_index]
-            
+        if acquired:
+            lock.release()
         return True
     
     def get_active_cameras(self) -> list:
-        return list(self.cameras.keys())
+        return [i for i in list(self.cameras) if self.is_camera_active(i)]
     
     def is_camera_active(self, camera_index: int) -> bool:
-        return camera_index in self.cameras and self.running.get(camera_index, False)
+        # Stalled and reconnecting cameras are registered but not active, so viewers and detection let go of them
+        health = self.health.get(camera_index)
+        return (camera_index in self.cameras and self.running.get(camera_index, False)
+                and health is not None and health.state == 'live')
+    
+    def get_health(self, camera_index: int) -> Optional[Dict]:
+        health = self.health.get(camera_index)
+        if health is None:
+            return None
+        interval = self.retrieve_intervals.get(camera_index, 0.0)
+        return dict(health.to_dict(), analyticsFps=round(1.0 / interval, 2) if interval else None, captureMode=CAPTURE_MODE)
+    
+    def health_stats(self) -> Dict[str, Dict]:
+        return {str(camera_index): self.get_health(camera_index) for camera_index in sorted(list(self.health))}
     
     def test_connection(self, camera_index: int, rtsp_url: Optional[str] = None) -> bool:
+        return self.probe(camera_index, rtsp_url)['connected']
+    
+    def probe(self, camera_index: int, rtsp_url: Optional[str] = None, timeout: float = 5.0) -> Dict:
+        # A live camera answers from its running capture instead of opening a second connection.
+        # latencyMs is the age of its newest frame there, and the time to open and read a first frame otherwise.
+        health = self.health.get(camera_index)
+        if health is not None and health.state == 'live':
+            _, timestamp, view = self.get_frame_view(camera_index)
+            return {
+                'connected': True,
+                'source': 'live',
+                'state': health.state,
+                'latencyMs': round((time.time() - timestamp) * 1000, 1) if timestamp else None,
+                'width': view.shape[1] if view is not None else None,
+                'height': view.shape[0] if view is not None else None,
+                'fps': round(health.grab_fps, 1),
+                'analyticsFps': round(health.fps, 1)
+            }
+        
+        result = {'connected': False, 'source': 'probe', 'state': health.state if health else None}
+        started = time.monotonic()
+        cap = None
         try:
-            if rtsp_url:
-                cap = cv2.VideoCapture(rtsp_url)
-            else:
-                cap = cv2.VideoCapture(camera_index)
-            
-            if cap.isOpened():
-                ret, _ = cap.read()
-                cap.release()
-                return ret
-            return False
+            cap = self._open(camera_index, rtsp_url, int(timeout * 1000))
+            if cap is None:
+                return dict(result, error='Could not open capture')
+            ret, frame = cap.read()
+            if not ret:
+                return dict(result, error='No frame received')
+            fps = cap.get(cv2.CAP_PROP_FPS)
+            return dict(
+                result,
+                connected=True,
+                latencyMs=round((time.monotonic() - started) * 1000, 1),
+                width=frame.shape[1],
+                height=frame.shape[0],
+                # Nominal stream rate; some sources report 0 or nonsense
+                fps=round(fps, 1) if 0 < fps < 1000 else None
+            )
         except Exception as e:
             print(f"Error testing camera connection: {e}")
-            return False
+            return dict(result, error=str(e))
+        finally:
+            if cap is not None:
+                cap.release()
+    
+    def probe_many(self, targets: List[Tuple[int, Optional[str]]], timeout: float = 5.0) -> Dict[int, Dict]:
+        # Probes run side by side on their own pool, so they never compete with the capture workers
+        with self.capture_condition:
+            if self.test_pool is None:
+                self.test_pool = ThreadPoolExecutor(TEST_WORKERS, thread_name_prefix='camera-test')
+        futures = {camera_index: self.test_pool.submit(self.probe, camera_index, rtsp_url, timeout)
+                   for camera_index, rtsp_url in targets}
+        # Each probe bounds its own open and read; the overall wait also covers local devices,
+        # which have no backend timeout, and probes queued behind a full pool
+        waves = -(-len(futures) // TEST_WORKERS)
+        wait(futures.values(), timeout=2 * timeout * max(waves, 1) + 1.0)
+        return {camera_index: future.result() if future.done() else
+                {'connected': False, 'source': 'probe', 'error': f'Timed out after {timeout:g}s'}
+                for camera_index, future in futures.items()}
 
 camera_manager = CameraManager()
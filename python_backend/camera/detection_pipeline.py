@@ -0,0 +1,245 @@
+import os
+import threading
+import time
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+import numpy as np
+from python_backend.camera.camera_manager import camera_manager, CameraManager
+from python_backend.ai_detection.detector import detector, AIDetector
+from python_backend.ai_detection.motion import MotionGate, Region
+from python_backend.ai_detection.tracker import TrackerRegistry
+
+class DetectionPipeline:
+    def __init__(self, manager: CameraManager, ai_detector: AIDetector, detection_fps: Optional[float] = None):
+        self.manager = manager
+        self.detector = ai_detector
+        self.detection_fps = float(detection_fps or os.getenv('DETECTION_FPS', 6))
+        self.results: Dict[int, Dict] = {}
+        self.processed_ids: Dict[int, int] = {}
+        self.motion_gate = MotionGate()
+        self.trackers = TrackerRegistry()
+        # Full detection runs on every Kth processed frame; the tracker coasts in between
+        self.detect_every = max(int(os.getenv('TRACKER_DETECT_EVERY', 3)), 1)
+        self.frame_counts: Dict[int, int] = {}
+        self.track_zones: Dict[int, Dict[str, set]] = {}
+        self.listeners: List[Callable[[Dict, List[Dict]], None]] = []
+        self.scheduler: Optional[threading.Thread] = None
+        self.running = False
+        self.condition = threading.Condition()
+        self.lock = threading.Lock()
+        # Held by the scheduler for a whole tick, so a camera is never torn down halfway through one
+        self.run_lock = threading.Lock()
+
+    def start(self, camera_index: Optional[int] = None) -> bool:
+        with self.lock:
+            if self.scheduler is None or not self.scheduler.is_alive():
+                self.running = True
+                self.scheduler = threading.Thread(target=self._run, daemon=True)
+                self.scheduler.start()
+
+        if camera_index is None:
+            return True
+        return self.manager.is_camera_active(camera_index)
+
+    def stop(self, camera_index: Optional[int] = None):
+        if camera_index is None:
+            with self.lock:
+                self.running = False
+                scheduler = self.scheduler
+                self.scheduler = None
+            if scheduler is not None and scheduler is not threading.current_thread():
+                scheduler.join(timeout=2.0)
+            return
+
+        # Callers remove the capture first, so no later tick picks the camera up again
+        with self.run_lock:
+            tracker = self.trackers.reset(camera_index)
+            previous = self.results.get(camera_index)
+            if tracker is not None and previous is not None:
+                # Tracks still in view leave now; otherwise their visits would stay open forever
+                tracker.end_all()
+                result = dict(previous, detections=[], demographics=self.detector.analyze_demographics([]),
+                              zones=self.detector.track_zone_activity(
+                                  [], camera_index, (previous['frameSize']['height'], previous['frameSize']['width'])),
+                              timestamp=time.time())
+                events = self._track_events(camera_index, tracker, [], result['timestamp'])
+                if events:
+                    self._publish(camera_index, result, events)
+            with self.condition:
+                self.results.pop(camera_index, None)
+                self.processed_ids.pop(camera_index, None)
+                self.condition.notify_all()
+            self.motion_gate.reset(camera_index)
+            self.frame_counts.pop(camera_index, None)
+            self.track_zones.pop(camera_index, None)
+
+    def _collect_frames(self) -> Dict[int, Tuple[int, np.ndarray]]:
+        frames = {}
+        for camera_index in self.manager.get_active_cameras():
+            # Copy, since a slow detection could otherwise see the ring slot overwritten
+            frame_id, _, frame = self.manager.get_frame_if_newer(camera_index, self.processed_ids.get(camera_index, 0))
+            if frame is not None:
+                frames[camera_index] = (frame_id, frame)
+        return frames
+
+    def _plan(self, pending: Dict[int, Tuple[int, np.ndarray]]):
+        frames: Dict[Hashable, np.ndarray] = {}
+        widths: Dict[Hashable, int] = {}
+        plans: Dict[int, Tuple[int, str, Optional[List[Region]]]] = {}
+
+        for camera_index, (frame_id, frame) in pending.items():
+            count = self.frame_counts.get(camera_index, 0) + 1
+            self.frame_counts[camera_index] = count
+            previous = self.results.get(camera_index)
+            if count % self.detect_every != 0 and previous is not None:
+                if previous['detections']:
+                    plans[camera_index] = (frame_id, 'track', None)
+                else:
+                    self.processed_ids[camera_index] = frame_id
+                continue
+
+            run, regions = self.motion_gate.check(camera_index, frame)
+            if not run and previous is not None:
+                # Static scene: the previous detections still hold
+                self.processed_ids[camera_index] = frame_id
+                continue
+
+            if regions is None or previous is None:
+                frames[camera_index] = frame
+                plans[camera_index] = (frame_id, 'full', None)
+                continue
+
+            # Crops are detected at the same scale the whole frame would have been
+            width = self.detector.width_for(camera_index)
+            min_size = self.detector.min_face_size
+            for i, (x, y, w, h) in enumerate(regions):
+                if w < min_size or h < min_size:
+                    continue
+                key = (camera_index, i)
+                frames[key] = frame[y:y + h, x:x + w]
+                widths[key] = int(w * width / frame.shape[1]) if width else 0
+            plans[camera_index] = (frame_id, 'regions', regions)
+
+        return frames, widths, plans
+
+    def _merge_regions(self, camera_index: int, regions: List[Region], batch: Dict) -> List[Dict]:
+        def inside(det):
+            bbox = det['bbox']
+            cx, cy = bbox['x'] + bbox['width'] / 2, bbox['y'] + bbox['height'] / 2
+            return any(x <= cx < x + w and y <= cy < y + h for x, y, w, h in regions)
+
+        previous = self.results.get(camera_index, {}).get('detections', [])
+        detections = [dict(det) for det in previous if not inside(det)]
+        for i, (x, y, _, _) in enumerate(regions):
+            for det in batch.get((camera_index, i), []):
+                bbox = det['bbox']
+                det['bbox'] = dict(bbox, x=bbox['x'] + x, y=bbox['y'] + y)
+                detections.append(det)
+        return detections
+
+    def add_listener(self, listener: Callable[[Dict, List[Dict]], None]):
+        # Listeners get every published result plus the track/zone events derived from it
+        self.listeners.append(listener)
+
+    def _track_events(self, camera_index: int, tracker, detections: List[Dict], timestamp: float) -> List[Dict]:
+        def event(action, track, zone_id=None):
+            return {
+                'action': action,
+                'cameraIndex': camera_index,
+                'trackingId': track['tracking_id'],
+                'zoneId': zone_id,
+                'timestamp': timestamp,
+                'confidence': track.get('confidence'),
+                'gender': track.get('gender'),
+                'ageRange': track.get('age_range'),
+                'isStaff': track.get('is_staff', False)
+            }
+
+        memory = self.track_zones.setdefault(camera_index, {})
+        events = [event('enter', track) for track in tracker.started]
+        for det in detections:
+            current = set(det.get('zone_ids', []))
+            before = memory.get(det['tracking_id'], set())
+            events.extend(event('zone_enter', det, zone_id) for zone_id in sorted(current - before))
+            events.extend(event('zone_exit', det, zone_id) for zone_id in sorted(before - current))
+            memory[det['tracking_id']] = current
+        for track in tracker.ended:
+            events.extend(event('zone_exit', track, zone_id) for zone_id in sorted(memory.pop(track['tracking_id'], set())))
+            events.append(event('exit', track))
+        return events
+
+    def _run(self):
+        interval = 1.0 / self.detection_fps if self.detection_fps > 0 else 0.0
+
+        while self.running:
+            started = time.monotonic()
+            with self.run_lock:
+                self._tick()
+
+            elapsed = time.monotonic() - started
+            time.sleep(max(interval - elapsed, 0.01))
+
+    def _tick(self):
+        pending = self._collect_frames()
+
+        if pending:
+            try:
+                frames, widths, plans = self._plan(pending)
+                # One batch per tick: whole frames and moving regions from every camera
+                batch = self.detector.detect_batch(frames, widths)
+                for camera_index, (frame_id, mode, regions) in plans.items():
+                    tracker = self.trackers.get(camera_index)
+                    if mode == 'track':
+                        detections = tracker.predict()
+                    elif mode == 'regions':
+                        detections = tracker.update(self._merge_regions(camera_index, regions, batch))
+                    else:
+                        detections = tracker.update(batch.get(camera_index, []))
+                    self.processed_ids[camera_index] = frame_id
+                    frame_shape = pending[camera_index][1].shape
+                    result = {
+                        'cameraIndex': camera_index,
+                        'frameId': frame_id,
+                        'detections': detections,
+                        'demographics': self.detector.analyze_demographics(detections),
+                        'zones': self.detector.track_zone_activity(detections, camera_index, frame_shape),
+                        'frameSize': {'width': frame_shape[1], 'height': frame_shape[0]},
+                        'timestamp': time.time()
+                    }
+                    self._publish(camera_index, result,
+                                  self._track_events(camera_index, tracker, detections, result['timestamp']))
+            except Exception as e:
+                print(f"Detection scheduler error: {e}")
+
+    def _publish(self, camera_index: int, result: Dict, events: Optional[List[Dict]] = None):
+        with self.condition:
+            self.results[camera_index] = result
+            self.condition.notify_all()
+
+        for listener in self.listeners:
+            try:
+                listener(result, events or [])
+            except Exception as e:
+                print(f"Detection listener error: {e}")
+
+    def get_result(self, camera_index: int) -> Optional[Dict]:
+        self.start(camera_index)
+        with self.condition:
+            return self.results.get(camera_index)
+
+    def wait_for_result(self, camera_index: int, after_frame_id: int = 0, timeout: float = 1.0) -> Optional[Dict]:
+        if not self.start(camera_index):
+            return None
+
+        deadline = time.monotonic() + timeout
+        with self.condition:
+            while True:
+                result = self.results.get(camera_index)
+                if result is not None and result['frameId'] > after_frame_id:
+                    return result
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self.condition.wait(remaining)
+
+detection_pipeline = DetectionPipeline(camera_manager, detector)
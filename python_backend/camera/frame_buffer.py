@@ -0,0 +1,76 @@
+import threading
+import time
+from typing import Optional, Tuple
+import numpy as np
+
+class FrameRing:
+    def __init__(self, slots: int = 4):
+        self.slots = max(int(slots), 2)
+        self.buffer: Optional[np.ndarray] = None
+        self.timestamps = np.zeros(self.slots, dtype=np.float64)
+        self.seq = 0
+        self.closed = False
+        self.lock = threading.Lock()
+        self.frame_ready = threading.Condition(self.lock)
+
+    def allocate(self, shape: Tuple[int, ...], dtype=np.uint8):
+        with self.lock:
+            self.buffer = np.empty((self.slots,) + tuple(shape), dtype=dtype)
+            self.timestamps[:] = 0.0
+
+    def write_slot(self) -> Optional[np.ndarray]:
+        # Slot the capture thread retrieves into next; readers only ever see committed slots
+        if self.buffer is None:
+            return None
+        return self.buffer[(self.seq + 1) % self.slots]
+
+    def commit(self, frame: np.ndarray, timestamp: float) -> int:
+        slot = self.write_slot()
+        if slot is None or slot.shape != frame.shape or slot.dtype != frame.dtype:
+            self.allocate(frame.shape, frame.dtype)
+            slot = self.write_slot()
+
+        if not np.shares_memory(slot, frame):
+            slot[...] = frame
+
+        with self.frame_ready:
+            self.seq += 1
+            self.timestamps[self.seq % self.slots] = timestamp
+            self.frame_ready.notify_all()
+            return self.seq
+
+    def close(self):
+        with self.frame_ready:
+            self.closed = True
+            self.frame_ready.notify_all()
+
+    def latest(self) -> Tuple[int, float, Optional[np.ndarray]]:
+        with self.lock:
+            return self._latest_locked()
+
+    def _latest_locked(self) -> Tuple[int, float, Optional[np.ndarray]]:
+        if self.buffer is None or self.seq == 0:
+            return 0, 0.0, None
+        index = self.seq % self.slots
+        view = self.buffer[index].view()
+        view.flags.writeable = False
+        return self.seq, float(self.timestamps[index]), view
+
+    def wait_newer(self, after_seq: int, timeout: Optional[float] = None) -> Tuple[int, float, Optional[np.ndarray]]:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.frame_ready:
+            while self.seq <= after_seq and not self.closed:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    break
+                self.frame_ready.wait(remaining)
+
+            if self.seq <= after_seq:
+                return self.seq, 0.0, None
+            return self._latest_locked()
+
+    def copy_if_newer(self, after_seq: int) -> Tuple[int, float, Optional[np.ndarray]]:
+        seq, timestamp, view = self.latest()
+        if view is None or seq <= after_seq:
+            return seq, timestamp, None
+        return seq, timestamp, view.copy()
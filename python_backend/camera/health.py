@@ -0,0 +1,116 @@
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+STALL_SECONDS = float(os.getenv('CAMERA_STALL_SECONDS', 10))
+BACKOFF_BASE = float(os.getenv('CAMERA_BACKOFF_SECONDS', 1))
+BACKOFF_MAX = float(os.getenv('CAMERA_BACKOFF_MAX_SECONDS', 60))
+
+# connecting    registered, first open still pending or failing (retried with the same backoff)
+# live          frames are arriving
+# stalled       no frame for STALL_SECONDS; the capture is reopened as soon as its worker gets control back
+# reconnecting  reopening, or waiting out the backoff after a failed reopen
+CAMERA_STATES = ('connecting', 'live', 'stalled', 'reconnecting')
+
+def _smooth(average_ms: float, seconds: float, count: int) -> float:
+    # Smoothed so one slow keyframe does not dominate the reading
+    return seconds * 1000 if count == 1 else average_ms * 0.9 + seconds * 1000 * 0.1
+
+class CameraHealth:
+    def __init__(self, source: Optional[str], state: str = 'live'):
+        self.source = source
+        self.state = state
+        self.connected = state == 'live'
+        self.started_at = time.monotonic()
+        self.last_frame_at = 0.0
+        self.last_frame_time: Optional[float] = None
+        self.grabbed = 0
+        self.frames = 0
+        self.skipped = 0
+        self.fps = 0.0
+        self.grab_fps = 0.0
+        self.grab_ms = 0.0
+        self.retrieve_ms = 0.0
+        self.dropped = 0
+        self.reconnects = 0
+        self.attempts = 0
+        self.next_attempt_at = 0.0
+        self.last_error: Optional[str] = None
+        self.stopped = threading.Event()
+        self._fps_frames = 0
+        self._fps_grabbed = 0
+        self._fps_at = self.started_at
+
+    def record_grab(self, seconds: float):
+        # Any frame from the camera, decoded or not, proves the stream is alive
+        self.grabbed += 1
+        self.last_frame_at = time.monotonic()
+        self.grab_ms = _smooth(self.grab_ms, seconds, self.grabbed)
+
+    def record_frame(self, seconds: float):
+        # A frame retrieved into the ring; seconds is the retrieve() alone, or the whole read() in read mode
+        self.frames += 1
+        self.last_frame_time = time.time()
+        self.retrieve_ms = _smooth(self.retrieve_ms, seconds, self.frames)
+
+    def record_skip(self):
+        self.skipped += 1
+
+    def record_drop(self):
+        self.dropped += 1
+
+    def stalled(self) -> bool:
+        return time.monotonic() - (self.last_frame_at or self.started_at) > STALL_SECONDS
+
+    def reconnect_failed(self, error: str) -> float:
+        # Exponential backoff between reopen attempts, capped at BACKOFF_MAX; returns the wait
+        delay = min(BACKOFF_BASE * 2 ** self.attempts, BACKOFF_MAX)
+        self.attempts += 1
+        self.state = 'reconnecting' if self.connected else 'connecting'
+        self.last_error = error
+        self.next_attempt_at = time.monotonic() + delay
+        return delay
+
+    def reconnected(self):
+        if self.connected:
+            self.reconnects += 1
+        self.connected = True
+        self.state = 'live'
+        self.attempts = 0
+        self.next_attempt_at = 0.0
+        # The new capture gets a full stall window to deliver its first frame
+        self.last_frame_at = time.monotonic()
+
+    def tick(self):
+        # Called by the supervisor once per interval to refresh fps and flag stalls
+        now = time.monotonic()
+        if now > self._fps_at:
+            self.fps = (self.frames - self._fps_frames) / (now - self._fps_at)
+            self.grab_fps = (self.grabbed - self._fps_grabbed) / (now - self._fps_at)
+        self._fps_frames, self._fps_grabbed, self._fps_at = self.frames, self.grabbed, now
+        if self.state == 'live' and self.stalled():
+            self.state = 'stalled'
+            self.last_error = f'No frame for {STALL_SECONDS:g}s'
+            return True
+        return False
+
+    def to_dict(self) -> Dict:
+        now = time.monotonic()
+        return {
+            'state': self.state,
+            'fps': round(self.fps, 1),
+            'grabFps': round(self.grab_fps, 1),
+            'grabMs': round(self.grab_ms, 1),
+            'retrieveMs': round(self.retrieve_ms, 1),
+            'grabbed': self.grabbed,
+            'frames': self.frames,
+            'skipped': self.skipped,
+            'dropped': self.dropped,
+            'reconnects': self.reconnects,
+            'reconnectAttempts': self.attempts,
+            'nextAttemptIn': round(max(self.next_attempt_at - now, 0.0), 1) if self.state == 'reconnecting' else None,
+            'lastFrameAge': round(now - self.last_frame_at, 1) if self.last_frame_at else None,
+            'lastFrameAt': self.last_frame_time,
+            'lastError': self.last_error
+        }
@@ -0,0 +1,101 @@
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional, Set
+from python_backend.camera.detection_pipeline import detection_pipeline
+
+class Subscription:
+    def __init__(self, camera_index: int, maxsize: int, notify: Optional[Callable[[], None]] = None):
+        self.camera_index = camera_index
+        self.queue: deque = deque(maxlen=maxsize)
+        self.condition = threading.Condition()
+        self.notify = notify
+        self.dropped = 0
+
+    def put(self, item: Dict):
+        # Never blocks the producer: a full queue silently loses its oldest entry
+        with self.condition:
+            if len(self.queue) == self.queue.maxlen:
+                self.dropped += 1
+            self.queue.append(item)
+            self.condition.notify()
+        # Wakes consumers that do not block on the condition, e.g. an asyncio task
+        if self.notify is not None:
+            self.notify()
+
+    def get(self, timeout: Optional[float] = None, latest: bool = False) -> Optional[Dict]:
+        # latest=True drains the backlog and returns only the newest item
+        with self.condition:
+            if not self.queue and not self.condition.wait_for(lambda: self.queue, timeout):
+                return None
+            if latest:
+                item = self.queue.pop()
+                self.queue.clear()
+                return item
+            return self.queue.popleft()
+
+    def depth(self) -> int:
+        return len(self.queue)
+
+class ResultHub:
+    # Fans every published detection result out to the per-connection queues of its camera
+    def __init__(self, queue_size: Optional[int] = None):
+        self.queue_size = int(queue_size or os.getenv('HUB_QUEUE_SIZE', 8))
+        self.subscribers: Dict[int, Set[Subscription]] = {}
+        self.lock = threading.Lock()
+        self.published: Dict[int, int] = {}
+        self.departed_drops: Dict[int, int] = {}
+        self.publish_seconds = 0.0
+
+    def subscribe(self, camera_index: int, maxsize: Optional[int] = None,
+                  notify: Optional[Callable[[], None]] = None) -> Subscription:
+        subscription = Subscription(camera_index, maxsize or self.queue_size, notify)
+        with self.lock:
+            self.subscribers.setdefault(camera_index, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self.lock:
+            subscribers = self.subscribers.get(subscription.camera_index)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self.subscribers[subscription.camera_index]
+            self.departed_drops[subscription.camera_index] = (
+                self.departed_drops.get(subscription.camera_index, 0) + subscription.dropped)
+
+    def publish(self, result: Dict, events: Optional[List[Dict]] = None):
+        started = time.perf_counter()
+        camera_index = result['cameraIndex']
+        with self.lock:
+            # Snapshot so subscribers can come and go while we deliver
+            subscribers = list(self.subscribers.get(camera_index, ()))
+            self.published[camera_index] = self.published.get(camera_index, 0) + 1
+        for subscription in subscribers:
+            subscription.put(result)
+        self.publish_seconds += time.perf_counter() - started
+
+    def stats(self) -> Dict:
+        with self.lock:
+            cameras = set(self.subscribers) | set(self.published)
+            per_camera = {}
+            for camera_index in sorted(cameras):
+                subscribers = list(self.subscribers.get(camera_index, ()))
+                depths = [s.depth() for s in subscribers]
+                per_camera[str(camera_index)] = {
+                    'subscribers': len(subscribers),
+                    'published': self.published.get(camera_index, 0),
+                    'queued': sum(depths),
+                    'maxDepth': max(depths, default=0),
+                    'dropped': sum(s.dropped for s in subscribers) + self.departed_drops.get(camera_index, 0)
+                }
+        return {
+            'queueSize': self.queue_size,
+            'subscribers': sum(c['subscribers'] for c in per_camera.values()),
+            'publishMs': round(self.publish_seconds * 1000, 1),
+            'cameras': per_camera
+        }
+
+result_hub = ResultHub()
+detection_pipeline.add_listener(result_hub.publish)
@@ -0,0 +1,179 @@
+import json
+import os
+import threading
+import time
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+import cv2
+import numpy as np
+from python_backend.camera.camera_manager import camera_manager
+from python_backend.camera.detection_pipeline import detection_pipeline
+
+MAX_FPS = float(os.getenv('STREAM_MAX_FPS', 15))
+
+# width None keeps the camera resolution. STREAM_PROFILES (JSON) adds or overrides entries, e.g.
+#   {"wall": {"width": 240, "quality": 50, "fps": 2}}
+STREAM_PROFILES: Dict[str, Dict] = {
+    'full': {'width': None, 'quality': 80, 'fps': MAX_FPS},
+    'medium': {'width': 640, 'quality': 70, 'fps': min(10.0, MAX_FPS)},
+    'thumbnail': {'width': 320, 'quality': 60, 'fps': min(5.0, MAX_FPS)},
+}
+STREAM_PROFILES.update(json.loads(os.getenv('STREAM_PROFILES', '{}')))
+DEFAULT_PROFILE = os.getenv('STREAM_PROFILE', 'full')
+
+def resolve_profile(name: Optional[str]) -> str:
+    profile = name or DEFAULT_PROFILE
+    if profile not in STREAM_PROFILES:
+        raise ValueError(f"Unknown stream profile '{profile}', expected one of: {', '.join(STREAM_PROFILES)}")
+    return profile
+
+def profile_scale(profile: str, frame_width: int) -> float:
+    width = STREAM_PROFILES[profile]['width']
+    return width / frame_width if width and frame_width > width else 1.0
+
+class EncodedFrame(NamedTuple):
+    seq: int
+    timestamp: float
+    jpeg: bytes
+    encoded_at: float
+
+def annotate(frame: np.ndarray, detections: List[Dict], scale: float = 1.0) -> np.ndarray:
+    for det in detections:
+        bbox = det['bbox']
+        x1, y1 = int(bbox['x'] * scale), int(bbox['y'] * scale)
+        x2, y2 = int((bbox['x'] + bbox['width']) * scale), int((bbox['y'] + bbox['height']) * scale)
+        color = (255, 0, 255) if det.get('is_staff') else (0, 255, 255)
+        cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+        label = f"{det.get('gender', 'Unknown')} {det.get('age_range', '')}"
+        cv2.putText(frame, label, (x1, max(y1 - 10, 10)), cv2.FONT_HERSHEY_SIMPLEX, 0.5 * max(scale, 0.5), color, 1)
+    return frame
+
+class CameraStreamEncoder:
+    # Encodes at most one JPEG per new camera frame (and per 1/fps) no matter how many clients read it
+    def __init__(self, camera_index: int, profile: str):
+        settings = STREAM_PROFILES[profile]
+        self.camera_index = camera_index
+        self.profile = profile
+        self.width = settings['width']
+        self.quality = settings['quality']
+        self.interval = 1.0 / settings['fps']
+        self.latest: Optional[EncodedFrame] = None
+        self.condition = threading.Condition()
+        self.encoding = False
+        self.encodes = 0
+        self.served = 0
+        self.viewers = 0
+
+    def _encode(self, seq: int, timestamp: float, view: np.ndarray) -> Optional[EncodedFrame]:
+        height, width = view.shape[:2]
+        scale = profile_scale(self.profile, width)
+        if scale < 1.0:
+            frame = cv2.resize(view, (self.width, int(height * scale)), interpolation=cv2.INTER_AREA)
+        else:
+            frame = view.copy()
+
+        result = detection_pipeline.get_result(self.camera_index)
+        if result:
+            annotate(frame, result['detections'], scale)
+
+        ok, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        if not ok:
+            return None
+        self.encodes += 1
+        return EncodedFrame(seq, timestamp, buffer.tobytes(), time.monotonic())
+
+    def next_frame(self, after_seq: int = 0, timeout: float = 5.0) -> Optional[EncodedFrame]:
+        # Returns the newest encoded frame with seq > after_seq. One caller at a time becomes the encoder;
+        # everyone else waits for its result instead of encoding the same frame again.
+        deadline = time.monotonic() + timeout
+        with self.condition:
+            while True:
+                cached = self.latest
+                if cached is not None and cached.seq > after_seq:
+                    self.served += 1
+                    return cached
+                if not self.encoding:
+                    self.encoding = True
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self.condition.wait(remaining)
+
+        encoded = None
+        try:
+            if cached is not None:
+                wait = cached.encoded_at + self.interval - time.monotonic()
+                if wait > 0:
+                    time.sleep(wait)
+            seq, timestamp, view = camera_manager.wait_for_frame(
+                self.camera_index, cached.seq if cached else 0,
+                timeout=max(deadline - time.monotonic(), 0.0))
+            if view is not None:
+                encoded = self._encode(seq, timestamp, view)
+        finally:
+            with self.condition:
+                if encoded is not None:
+                    self.latest = encoded
+                    self.served += 1
+                self.encoding = False
+                self.condition.notify_all()
+        return encoded
+
+    def snapshot(self, timeout: float = 2.0) -> Optional[EncodedFrame]:
+        # A cached frame younger than one frame interval is as fresh as a new encode would be
+        cached = self.latest
+        if cached is not None and time.monotonic() - cached.encoded_at <= self.interval:
+            return cached
+        return self.next_frame(cached.seq if cached else 0, timeout) or cached
+
+    def frames(self, is_active, timeout: float = 5.0) -> Iterator[EncodedFrame]:
+        # One viewer's sequence of frames, for as long as is_active() holds
+        with self.condition:
+            self.viewers += 1
+        try:
+            last_seq = 0
+            while is_active():
+                encoded = self.next_frame(last_seq, timeout)
+                if encoded is not None:
+                    last_seq = encoded.seq
+                    yield encoded
+        finally:
+            with self.condition:
+                self.viewers -= 1
+
+    def stats(self) -> Dict:
+        return {
+            'viewers': self.viewers,
+            'encodes': self.encodes,
+            'served': self.served,
+            'bytes': len(self.latest.jpeg) if self.latest else 0,
+            'lastSeq': self.latest.seq if self.latest else 0
+        }
+
+class StreamEncoderRegistry:
+    def __init__(self):
+        self.encoders: Dict[Tuple[int, str], CameraStreamEncoder] = {}
+        self.lock = threading.Lock()
+
+    def get(self, camera_index: int, profile: Optional[str] = None) -> CameraStreamEncoder:
+        # Encoders exist only for profiles someone asked for, so unused resolutions cost nothing
+        profile = resolve_profile(profile)
+        with self.lock:
+            encoder = self.encoders.get((camera_index, profile))
+            if encoder is None:
+                encoder = CameraStreamEncoder(camera_index, profile)
+                self.encoders[(camera_index, profile)] = encoder
+            return encoder
+
+    def reset(self, camera_index: int):
+        # Frame sequence numbers restart with a new capture, so cached frames must go with the old one
+        with self.lock:
+            for key in [key for key in self.encoders if key[0] == camera_index]:
+                del self.encoders[key]
+
+    def stats(self) -> Dict[str, Dict]:
+        with self.lock:
+            return {f'{camera_index}/{profile}': encoder.stats()
+                    for (camera_index, profile), encoder in self.encoders.items()}
+
+stream_encoders = StreamEncoderRegistry()
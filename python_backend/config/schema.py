@@ -0,0 +1,51 @@
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from python_backend.config.partitions import ensure_partitions, migrate_to_partitioned
+from python_backend.analytics.rollups import backfill_store_rollups
+
+# Columns added after the first release; create_all() never alters existing tables
+ADDED_COLUMNS = [
+    ('zones', 'camera_index', 'INTEGER'),
+    ('zones', 'polygon', 'TEXT'),
+    ('zone_stats', 'dwell_samples', 'INTEGER DEFAULT 0'),
+    ('cameras', 'substream_url', 'TEXT'),
+    ('cameras', 'analytics_fps', 'DOUBLE PRECISION'),
+]
+
+# Columns renamed after release; renamed in place before ADDED_COLUMNS would add them empty
+RENAMED_COLUMNS = [
+    ('cameras', 'decode_fps', 'analytics_fps'),
+]
+
+# Bump whenever models or ADDED_COLUMNS change; startup only runs the full schema pass when this moved
+SCHEMA_VERSION = 4
+
+def schema_is_current(engine) -> bool:
+    try:
+        with engine.connect() as conn:
+            return conn.execute(text('SELECT version FROM schema_version')).scalar() == SCHEMA_VERSION
+    except DBAPIError:
+        return False
+
+def upgrade_schema(engine, metadata):
+    with engine.begin() as conn:
+        for table, old, new in RENAMED_COLUMNS:
+            columns = set(conn.execute(text(
+                'SELECT column_name FROM information_schema.columns '
+                'WHERE table_name = :table AND table_schema = current_schema()'
+            ), {'table': table}).scalars())
+            if old in columns and new not in columns:
+                conn.execute(text(f'ALTER TABLE {table} RENAME COLUMN {old} TO {new}'))
+        for table, column, column_type in ADDED_COLUMNS:
+            conn.execute(text(f'ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {column} {column_type}'))
+        migrate_to_partitioned(conn)
+        ensure_partitions(conn)
+        # Indexes declared on existing tables are likewise only created with the table
+        for table in metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+        # The dashboard reads the rollups, which start out empty on a database that already has visits
+        backfill_store_rollups(conn)
+        conn.execute(text('CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)'))
+        conn.execute(text('DELETE FROM schema_version'))
+        conn.execute(text('INSERT INTO schema_version (version) VALUES (:version)'), {'version': SCHEMA_VERSION})
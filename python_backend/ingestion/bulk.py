@@ -0,0 +1,176 @@
+import json
+import os
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+from sqlalchemy import insert, select
+from python_backend.config.database import db
+from python_backend.ingestion.event_writer import upsert_customers
+from python_backend.models.models import Alert, Customer, TrackingEvent, Zone
+
+MAX_RECORDS = int(os.getenv('BULK_MAX_RECORDS', 50000))
+
+# Each bulk call returns one result per input record, in input order:
+#   {'index': i, 'id': ...} on success, {'index': i, 'error': '...'} when the record was rejected
+
+def parse_records(body: bytes, ndjson: bool) -> List:
+    # JSON array or newline-delimited JSON; unparseable NDJSON lines become per-row errors, not a failed request
+    if not ndjson:
+        records = json.loads(body)
+        if not isinstance(records, list):
+            raise ValueError('Body must be a JSON array')
+        return records
+    records = []
+    for line in body.splitlines():
+        if not line.strip():
+            continue
+        try:
+            records.append(json.loads(line))
+        except ValueError as e:
+            records.append(ValueError(f'Invalid JSON: {e}'))
+    return records
+
+def _text(record: Dict, key: str, required: bool = False) -> Optional[str]:
+    value = record.get(key)
+    if value is None or value == '':
+        if required:
+            raise ValueError(f'{key} is required')
+        return None
+    if not isinstance(value, str):
+        raise ValueError(f'{key} must be a string')
+    return value
+
+def _integer(record: Dict, key: str, required: bool = False) -> Optional[int]:
+    value = record.get(key)
+    if value is None:
+        if required:
+            raise ValueError(f'{key} is required')
+        return None
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise ValueError(f'{key} must be an integer')
+    return value
+
+def _timestamp(record: Dict, key: str) -> Optional[datetime]:
+    # Naive UTC like every other timestamp column; offsets such as 'Z' are converted, not dropped
+    value = record.get(key)
+    if value is None:
+        return None
+    try:
+        if isinstance(value, bool):
+            raise TypeError
+        moment = datetime.fromisoformat(value) if isinstance(value, str) else datetime.utcfromtimestamp(float(value))
+    except (TypeError, ValueError, OverflowError, OSError):
+        raise ValueError(f'{key} must be an ISO 8601 string or epoch seconds')
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+def _validate(records: List, validate: Callable[[Dict], Dict]) -> Tuple[List[Tuple[int, Dict]], List[Dict]]:
+    valid, results = [], [None] * len(records)
+    for index, record in enumerate(records):
+        try:
+            if isinstance(record, Exception):
+                raise record
+            if not isinstance(record, dict):
+                raise ValueError('Record must be an object')
+            valid.append((index, validate(record)))
+        except ValueError as e:
+            results[index] = {'index': index, 'error': str(e)}
+    return valid, results
+
+def _event_row(record: Dict) -> Dict:
+    confidence = record.get('confidence')
+    if confidence is not None and (isinstance(confidence, bool) or not isinstance(confidence, (int, float))):
+        raise ValueError('confidence must be a number')
+    metadata = record.get('metadata')
+    return {
+        'customer_id': _integer(record, 'customerId', required=True),
+        'zone_id': _integer(record, 'zoneId'),
+        'action': _text(record, 'action', required=True),
+        'timestamp': _timestamp(record, 'timestamp') or datetime.utcnow(),
+        'confidence': confidence,
+        'event_metadata': json.dumps(metadata) if isinstance(metadata, (dict, list)) else metadata
+    }
+
+def insert_events(records: List) -> List[Dict]:
+    valid, results = _validate(records, _event_row)
+
+    # Foreign keys are checked for the whole batch with one query per table instead of failing the insert
+    customer_ids = {row['customer_id'] for _, row in valid}
+    zone_ids = {row['zone_id'] for _, row in valid if row['zone_id'] is not None}
+    known_customers = set(db.session.scalars(select(Customer.id).where(Customer.id.in_(customer_ids)))) if customer_ids else set()
+    known_zones = set(db.session.scalars(select(Zone.id).where(Zone.id.in_(zone_ids)))) if zone_ids else set()
+
+    rows = []
+    for index, row in valid:
+        if row['customer_id'] not in known_customers:
+            results[index] = {'index': index, 'error': f"Unknown customerId {row['customer_id']}"}
+        elif row['zone_id'] is not None and row['zone_id'] not in known_zones:
+            results[index] = {'index': index, 'error': f"Unknown zoneId {row['zone_id']}"}
+        else:
+            rows.append((index, row))
+
+    if rows:
+        ids = db.session.scalars(
+            insert(TrackingEvent).returning(TrackingEvent.id, sort_by_parameter_order=True),
+            [row for _, row in rows]
+        ).all()
+        for (index, _), event_id in zip(rows, ids):
+            results[index] = {'index': index, 'id': event_id}
+    return results
+
+def _customer_row(record: Dict) -> Dict:
+    is_staff = record.get('isStaff', False)
+    if not isinstance(is_staff, bool):
+        raise ValueError('isStaff must be a boolean')
+    seen = _timestamp(record, 'lastSeen') or _timestamp(record, 'timestamp') or datetime.utcnow()
+    return {
+        'tracking_id': _text(record, 'trackingId', required=True),
+        'gender': _text(record, 'gender'),
+        'age_range': _text(record, 'ageRange'),
+        'is_staff': is_staff,
+        'first_seen': _timestamp(record, 'firstSeen') or seen,
+        'last_seen': seen,
+        'total_visits': 1
+    }
+
+def upsert_customer_records(records: List) -> List[Dict]:
+    valid, results = _validate(records, _customer_row)
+
+    # ON CONFLICT cannot touch the same row twice in one statement, so repeats are folded first
+    merged: Dict[str, Dict] = {}
+    for _, row in valid:
+        current = merged.get(row['tracking_id'])
+        if current is None:
+            merged[row['tracking_id']] = dict(row)
+            continue
+        current['first_seen'] = min(current['first_seen'], row['first_seen'])
+        current['last_seen'] = max(current['last_seen'], row['last_seen'])
+        current['total_visits'] += 1
+        for key in ('gender', 'age_range'):
+            current[key] = row[key] or current[key]
+
+    customer_ids = upsert_customers(list(merged.values()), count_visits=True)
+    for index, row in valid:
+        results[index] = {'index': index, 'id': customer_ids[row['tracking_id']], 'trackingId': row['tracking_id']}
+    return results
+
+def _alert_row(record: Dict) -> Dict:
+    return {
+        'type': _text(record, 'type', required=True),
+        'title': _text(record, 'title', required=True),
+        'message': _text(record, 'message', required=True),
+        'location': _text(record, 'location'),
+        'status': _text(record, 'status') or 'active',
+        'created_at': _timestamp(record, 'createdAt') or datetime.utcnow()
+    }
+
+def insert_alerts(records: List) -> List[Dict]:
+    valid, results = _validate(records, _alert_row)
+    if valid:
+        ids = db.session.scalars(
+            insert(Alert).returning(Alert.id, sort_by_parameter_order=True),
+            [row for _, row in valid]
+        ).all()
+        for (index, _), alert_id in zip(valid, ids):
+            results[index] = {'index': index, 'id': alert_id}
+    return results
@@ -0,0 +1,164 @@
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+from sqlalchemy import Integer, bindparam, func, insert, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from python_backend.analytics.rollups import rollup_engine
+from python_backend.config.database import db
+from python_backend.models.models import Customer, TrackingEvent, Visit
+
+def upsert_customers(rows: List[Dict], count_visits: bool = False) -> Dict[str, int]:
+    # INSERT ... ON CONFLICT executed as batched multi-row VALUES; rows need unique tracking ids and the same keys.
+    # Returns tracking_id -> customer id. count_visits adds each row's total_visits and fills in missing demographics.
+    if not rows:
+        return {}
+    stmt = pg_insert(Customer)
+    updates = {'last_seen': func.greatest(Customer.last_seen, stmt.excluded.last_seen)}
+    if count_visits:
+        updates['total_visits'] = func.coalesce(Customer.total_visits, 0) + stmt.excluded.total_visits
+        updates['gender'] = func.coalesce(stmt.excluded.gender, Customer.gender)
+        updates['age_range'] = func.coalesce(stmt.excluded.age_range, Customer.age_range)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Customer.tracking_id],
+        set_=updates
+    ).returning(Customer.id, Customer.tracking_id)
+    return {tracking_id: customer_id for customer_id, tracking_id in db.session.execute(stmt, rows)}
+
+class EventWriter:
+    def __init__(self, max_queue: Optional[int] = None, batch_size: Optional[int] = None,
+                 flush_interval: Optional[float] = None):
+        self.queue: 'queue.Queue[Dict]' = queue.Queue(maxsize=int(max_queue or os.getenv('EVENT_QUEUE_SIZE', 10000)))
+        self.batch_size = int(batch_size or os.getenv('EVENT_BATCH_SIZE', 500))
+        self.flush_interval = float(flush_interval or os.getenv('EVENT_FLUSH_INTERVAL', 1.0))
+        self.app = None
+        self.thread: Optional[threading.Thread] = None
+        self.running = False
+        self.lock = threading.Lock()
+        self.counters = {'accepted': 0, 'dropped': 0, 'written': 0, 'failed': 0, 'batches': 0}
+        self.last_flush_ms = 0.0
+
+    def start(self, app):
+        with self.lock:
+            if self.thread is not None and self.thread.is_alive():
+                return
+            self.app = app
+            self.running = True
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join(timeout=timeout)
+
+    def submit(self, events: List[Dict]) -> int:
+        # Never blocks the caller: when the queue is full the newest events are dropped and counted
+        accepted = 0
+        for event in events:
+            try:
+                self.queue.put_nowait(event)
+                accepted += 1
+            except queue.Full:
+                break
+        with self.lock:
+            self.counters['accepted'] += accepted
+            self.counters['dropped'] += len(events) - accepted
+        return accepted
+
+    def on_result(self, result: Dict, events: List[Dict]):
+        if events:
+            self.submit(events)
+
+    def _run(self):
+        while self.running or not self.queue.empty():
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            if batch:
+                self._flush(batch)
+
+    def _flush(self, batch: List[Dict]):
+        started = time.perf_counter()
+        try:
+            with self.app.app_context():
+                self.write(batch)
+                db.session.commit()
+            with self.lock:
+                self.counters['written'] += len(batch)
+                self.counters['batches'] += 1
+        except Exception as e:
+            with self.app.app_context():
+                db.session.rollback()
+            with self.lock:
+                self.counters['failed'] += len(batch)
+            print(f"Event writer flush failed ({len(batch)} events): {e}")
+        self.last_flush_ms = (time.perf_counter() - started) * 1000
+
+    def write(self, batch: List[Dict]):
+        for event in batch:
+            event['time'] = datetime.utcfromtimestamp(event['timestamp'])
+
+        customers = {}
+        for event in batch:
+            row = customers.setdefault(event['trackingId'], {
+                'tracking_id': event['trackingId'],
+                'gender': event.get('gender'),
+                'age_range': event.get('ageRange'),
+                'is_staff': bool(event.get('isStaff')),
+                'first_seen': event['time'],
+                'last_seen': event['time']
+            })
+            row['last_seen'] = max(row['last_seen'], event['time'])
+        customer_ids = upsert_customers(list(customers.values()))
+
+        entries = [{'customer_id': customer_ids[e['trackingId']], 'entry_time': e['time']}
+                   for e in batch if e['action'] == 'enter']
+        if entries:
+            db.session.execute(insert(Visit), entries)
+
+        exits = [{'cid': customer_ids[e['trackingId']], 'exit': e['time']}
+                 for e in batch if e['action'] == 'exit']
+        if exits:
+            # Core table statement so the list of params runs as a plain executemany
+            visits = Visit.__table__
+            db.session.execute(
+                update(visits)
+                .where(visits.c.customer_id == bindparam('cid'), visits.c.exit_time.is_(None))
+                .values(exit_time=bindparam('exit'),
+                        total_dwell_time=func.extract('epoch', bindparam('exit') - visits.c.entry_time).cast(Integer)),
+                exits
+            )
+
+        db.session.execute(insert(TrackingEvent), [{
+            'customer_id': customer_ids[e['trackingId']],
+            'zone_id': e.get('zoneId'),
+            'action': e['action'],
+            'timestamp': e['time'],
+            'confidence': e.get('confidence'),
+            'event_metadata': json.dumps({'cameraIndex': e.get('cameraIndex')})
+        } for e in batch])
+
+        # Hourly aggregates move in the same transaction as the raw rows they summarize
+        rollup_engine.apply_events(batch)
+
+    def stats(self) -> Dict:
+        with self.lock:
+            stats = dict(self.counters)
+        stats['queued'] = self.queue.qsize()
+        stats['capacity'] = self.queue.maxsize
+        stats['lastFlushMs'] = round(self.last_flush_ms, 1)
+        stats['running'] = bool(self.thread and self.thread.is_alive())
+        return stats
+
+event_writer = EventWriter()
@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import Integer, String, Text, DateTime, Boolean, Numeric, ForeignKey
+from sqlalchemy import Integer, String, Text, DateTime, Boolean, Numeric, Float, ForeignKey, Index, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from python_backend.config.database import db
 
@@ -10,6 +10,8 @@ class Zone(db.Model):
     name: Mapped[str] = mapped_column(Text, nullable=False)
     type: Mapped[str] = mapped_column(Text, nullable=False)
     capacity: Mapped[int] = mapped_column(Integer, default=50)
+    camera_index: Mapped[int] = mapped_column(Integer, nullable=True)
+    polygon: Mapped[str] = mapped_column(Text, nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     
     zone_stats = relationship('ZoneStats', back_populates='zone')
@@ -38,10 +40,15 @@ class Customer(db.Model):
 
 class Visit(db.Model):
     __tablename__ = 'visits'
+    __table_args__ = (
+        # Open visits are a small, hot subset: occupancy counts and exit matching only touch these
+        Index('ix_visits_open_entry_time', 'entry_time', postgresql_where=text('exit_time IS NULL')),
+        Index('ix_visits_open_customer', 'customer_id', postgresql_where=text('exit_time IS NULL')),
+    )
     
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     customer_id: Mapped[int] = mapped_column(Integer, ForeignKey('customers.id'), nullable=False)
-    entry_time: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    entry_time: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
     exit_time: Mapped[datetime] = mapped_column(DateTime, nullable=True)
     total_dwell_time: Mapped[int] = mapped_column(Integer, nullable=True)
     
@@ -49,12 +56,18 @@ class Visit(db.Model):
 
 class TrackingEvent(db.Model):
     __tablename__ = 'tracking_events'
-    
-    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    __table_args__ = (
+        Index('ix_tracking_events_customer_timestamp', 'customer_id', 'timestamp'),
+        Index('ix_tracking_events_zone_timestamp', 'zone_id', 'timestamp'),
+        # Monthly partitions are managed by config/partitions.py; the key must be part of the primary key
+        {'postgresql_partition_by': 'RANGE (timestamp)'},
+    )
+    
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     customer_id: Mapped[int] = mapped_column(Integer, ForeignKey('customers.id'), nullable=False)
     zone_id: Mapped[int] = mapped_column(Integer, ForeignKey('zones.id'), nullable=True)
     action: Mapped[str] = mapped_column(Text, nullable=False)
-    timestamp: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    timestamp: Mapped[datetime] = mapped_column(DateTime, primary_key=True, default=datetime.utcnow, index=True)
     confidence: Mapped[float] = mapped_column(Numeric(5, 2), nullable=True)
     event_metadata: Mapped[str] = mapped_column('metadata', Text, nullable=True)
     
@@ -66,6 +79,9 @@ class TrackingEvent(db.Model):
 
 class Alert(db.Model):
     __tablename__ = 'alerts'
+    __table_args__ = (
+        Index('ix_alerts_status_created_at', 'status', 'created_at'),
+    )
     
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     type: Mapped[str] = mapped_column(Text, nullable=False)
@@ -81,6 +97,10 @@ class Alert(db.Model):
 
 class ZoneStats(db.Model):
     __tablename__ = 'zone_stats'
+    __table_args__ = (
+        Index('ix_zone_stats_zone_date', 'zone_id', 'date'),
+        Index('ix_zone_stats_date', 'date'),
+    )
     
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     zone_id: Mapped[int] = mapped_column(Integer, ForeignKey('zones.id'), nullable=False)
@@ -88,9 +108,30 @@ class ZoneStats(db.Model):
     hour: Mapped[int] = mapped_column(Integer, nullable=True)
     visitor_count: Mapped[int] = mapped_column(Integer, default=0)
     avg_dwell_time: Mapped[int] = mapped_column(Integer, default=0)
+    dwell_samples: Mapped[int] = mapped_column(Integer, default=0)
     
     zone = relationship('Zone', back_populates='zone_stats')
 
+class StoreHourlyStats(db.Model):
+    __tablename__ = 'store_hourly_stats'
+    
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    bucket: Mapped[datetime] = mapped_column(DateTime, nullable=False, unique=True)
+    visitor_count: Mapped[int] = mapped_column(Integer, default=0)
+    dwell_sum: Mapped[int] = mapped_column(Integer, default=0)
+    dwell_count: Mapped[int] = mapped_column(Integer, default=0)
+    male: Mapped[int] = mapped_column(Integer, default=0)
+    female: Mapped[int] = mapped_column(Integer, default=0)
+    age_0_12: Mapped[int] = mapped_column(Integer, default=0)
+    age_13_19: Mapped[int] = mapped_column(Integer, default=0)
+    age_20_35: Mapped[int] = mapped_column(Integer, default=0)
+    age_36_50: Mapped[int] = mapped_column(Integer, default=0)
+    age_51_70: Mapped[int] = mapped_column(Integer, default=0)
+    age_70_plus: Mapped[int] = mapped_column(Integer, default=0)
+    
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+
 class Camera(db.Model):
     __tablename__ = 'cameras'
     
@@ -100,10 +141,19 @@ class Camera(db.Model):
     location: Mapped[str] = mapped_column(Text, nullable=True)
     status: Mapped[str] = mapped_column(Text, default='active')
     rtsp_url: Mapped[str] = mapped_column(Text, nullable=True)
+    # Lower-resolution stream for analytics; captured instead of rtsp_url when set
+    substream_url: Mapped[str] = mapped_column(Text, nullable=True)
+    # Frames per second retrieved for streams and detection (every frame is still decoded);
+    # NULL uses CAPTURE_ANALYTICS_FPS, 0 retrieves every frame
+    analytics_fps: Mapped[float] = mapped_column(Float, nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
+    
+    @property
+    def capture_url(self):
+        return self.substream_url or self.rtsp_url
 
 
 class SystemSettings(db.Model):
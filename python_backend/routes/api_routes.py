@@ -1,43 +1,43 @@
 from flask import Blueprint, jsonify, request
-from sqlalchemy import func
-from datetime import datetime, timedelta
+from sqlalchemy.orm import joinedload
+from datetime import datetime
 from python_backend.models.models import Zone, Customer, Visit, TrackingEvent, Alert, ZoneStats
 from python_backend.config.database import db
 from python_backend.ai_detection.detector import detector
+from python_backend.routes.pagination import paginate
+from python_backend.ingestion.bulk import MAX_RECORDS as BULK_MAX_RECORDS, parse_records, insert_events, upsert_customer_records, insert_alerts
+from python_backend.ai_detection.zones import zone_engine, parse_polygon
+from python_backend.analytics.rollups import AGE_COLUMNS, day_range, store_rollups
+from python_backend.analytics.queries import occupancy_stats, overview_stats, hourly_traffic, demographics
+import json
 import numpy as np
 import cv2
 
 api_bp = Blueprint('api', __name__, url_prefix='/api')
 
+def _use_rollups() -> bool:
+    # ?source=raw recomputes from the visits table, e.g. to cross-check the rollups
+    return request.args.get('source') != 'raw'
+
 @api_bp.route('/stats/overview', methods=['GET'])
 def get_overview_stats():
     try:
-        today = datetime.utcnow().date()
-        today_start = datetime.combine(today, datetime.min.time())
-        
-        total_visitors = db.session.query(func.count(Visit.id)).filter(
-            Visit.entry_time >= today_start
-        ).scalar() or 0
-        
-        current_occupancy = db.session.query(func.count(Visit.id)).filter(
-            Visit.entry_time >= today_start,
-            Visit.exit_time.is_(None)
-        ).scalar() or 0
-        
-        avg_dwell = db.session.query(func.avg(Visit.total_dwell_time)).filter(
-            Visit.entry_time >= today_start,
-            Visit.total_dwell_time.isnot(None)
-        ).scalar() or 0
+        today_start, today_end = day_range()
         
-        zone_engagement = db.session.query(func.avg(ZoneStats.visitor_count)).filter(
-            ZoneStats.date >= today_start
-        ).scalar() or 0
+        if _use_rollups():
+            stats = occupancy_stats(today_start)
+            rollups = store_rollups(today_start, today_end)
+            stats['total_visitors'] = sum(r.visitor_count or 0 for r in rollups)
+            dwell_count = sum(r.dwell_count or 0 for r in rollups)
+            stats['avg_dwell_time'] = sum(r.dwell_sum or 0 for r in rollups) / dwell_count if dwell_count else 0
+        else:
+            stats = overview_stats(today_start, today_end)
         
         return jsonify({
-            'total_visitors': int(total_visitors),
-            'current_occupancy': int(current_occupancy),
-            'avg_dwell_time': int(avg_dwell),
-            'zone_engagement': round(float(zone_engagement), 1)
+            'total_visitors': int(stats['total_visitors'] or 0),
+            'current_occupancy': int(stats['current_occupancy'] or 0),
+            'avg_dwell_time': int(stats['avg_dwell_time'] or 0),
+            'zone_engagement': round(float(stats['zone_engagement'] or 0), 1)
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -45,21 +45,20 @@ def get_overview_stats():
 @api_bp.route('/tracking/live', methods=['GET'])
 def get_live_tracking():
     try:
-        active_visits = db.session.query(Visit).filter(
+        # Customer comes in through the same query, newest visits first
+        active_visits = db.session.query(Visit).options(
+            joinedload(Visit.customer, innerjoin=True)
+        ).filter(
             Visit.exit_time.is_(None)
-        ).limit(10).all()
-        
-        customers_data = []
-        for visit in active_visits:
-            customer = db.session.query(Customer).filter_by(id=visit.customer_id).first()
-            if customer:
-                customers_data.append({
-                    'id': customer.tracking_id,
-                    'gender': customer.gender,
-                    'ageRange': customer.age_range,
-                    'isStaff': customer.is_staff,
-                    'entryTime': visit.entry_time.isoformat() if visit.entry_time else None
-                })
+        ).order_by(Visit.entry_time.desc(), Visit.id.desc()).limit(10).all()
+        
+        customers_data = [{
+            'id': visit.customer.tracking_id,
+            'gender': visit.customer.gender,
+            'ageRange': visit.customer.age_range,
+            'isStaff': visit.customer.is_staff,
+            'entryTime': visit.entry_time.isoformat() if visit.entry_time else None
+        } for visit in active_visits]
         
         return jsonify(customers_data)
     except Exception as e:
@@ -68,57 +67,40 @@ def get_live_tracking():
 @api_bp.route('/analytics/demographics', methods=['GET'])
 def get_demographics():
     try:
-        today = datetime.utcnow().date()
-        today_start = datetime.combine(today, datetime.min.time())
-        
-        visits_today = db.session.query(Visit).filter(
-            Visit.entry_time >= today_start
-        ).all()
-        
-        customer_ids = [v.customer_id for v in visits_today]
-        customers = db.session.query(Customer).filter(
-            Customer.id.in_(customer_ids)
-        ).all() if customer_ids else []
-        
-        demographics = {
-            'male': sum(1 for c in customers if c.gender == 'Male'),
-            'female': sum(1 for c in customers if c.gender == 'Female'),
-            'age_distribution': {
-                '0-12': 0, '13-19': 0, '20-35': 0,
-                '36-50': 0, '51-70': 0, '70+': 0
-            }
-        }
+        today_start, today_end = day_range()
         
-        for customer in customers:
-            if customer.age_range in demographics['age_distribution']:
-                demographics['age_distribution'][customer.age_range] += 1
+        if not _use_rollups():
+            return jsonify(demographics(today_start, today_end))
+        
+        result = {
+            'male': 0,
+            'female': 0,
+            'age_distribution': {age: 0 for age in AGE_COLUMNS}
+        }
+        for r in store_rollups(today_start, today_end):
+            result['male'] += r.male or 0
+            result['female'] += r.female or 0
+            for age, column in AGE_COLUMNS.items():
+                result['age_distribution'][age] += getattr(r, column) or 0
         
-        return jsonify(demographics)
+        return jsonify(result)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @api_bp.route('/analytics/traffic', methods=['GET'])
 def get_traffic():
     try:
-        today = datetime.utcnow().date()
-        today_start = datetime.combine(today, datetime.min.time())
+        today_start, today_end = day_range()
         
-        traffic_data = []
-        for hour in range(24):
-            hour_start = today_start + timedelta(hours=hour)
-            hour_end = hour_start + timedelta(hours=1)
-            
-            count = db.session.query(func.count(Visit.id)).filter(
-                Visit.entry_time >= hour_start,
-                Visit.entry_time < hour_end
-            ).scalar() or 0
-            
-            traffic_data.append({
-                'hour': f'{hour:02d}:00',
-                'visitors': int(count)
-            })
+        if _use_rollups():
+            counts = {r.bucket.hour: r.visitor_count or 0 for r in store_rollups(today_start, today_end)}
+        else:
+            counts = hourly_traffic(today_start, today_end)
         
-        return jsonify(traffic_data)
+        return jsonify([{
+            'hour': f'{hour:02d}:00',
+            'visitors': int(counts.get(hour, 0))
+        } for hour in range(24)])
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -132,24 +114,36 @@ def handle_zones():
                 'name': z.name,
                 'type': z.type,
                 'capacity': z.capacity,
+                'cameraIndex': z.camera_index,
+                'polygon': parse_polygon(z.polygon),
                 'createdAt': z.created_at.isoformat() if z.created_at else None
             } for z in zones])
         
         elif request.method == 'POST':
             data = request.get_json()
+            try:
+                polygon = parse_polygon(data.get('polygon'))
+            except (ValueError, TypeError) as e:
+                return jsonify({'error': str(e)}), 400
+            
             zone = Zone(
                 name=data.get('name'),
                 type=data.get('type'),
-                capacity=data.get('capacity', 50)
+                capacity=data.get('capacity', 50),
+                camera_index=data.get('cameraIndex'),
+                polygon=json.dumps(polygon) if polygon else None
             )
             db.session.add(zone)
             db.session.commit()
+            zone_engine.load(db.session.query(Zone).all())
             
             return jsonify({
                 'id': zone.id,
                 'name': zone.name,
                 'type': zone.type,
-                'capacity': zone.capacity
+                'capacity': zone.capacity,
+                'cameraIndex': zone.camera_index,
+                'polygon': polygon
             }), 201
     except Exception as e:
         db.session.rollback()
@@ -164,15 +158,14 @@ def get_zone_stats():
         if zone_id:
             query = query.filter_by(zone_id=zone_id)
         
-        stats = query.all()
-        
-        return jsonify([{
+        return paginate(query, [ZoneStats.id], lambda s: {
+            'id': s.id,
             'zoneId': s.zone_id,
             'date': s.date.isoformat() if s.date else None,
             'hour': s.hour,
             'visitorCount': s.visitor_count,
             'avgDwellTime': s.avg_dwell_time
-        } for s in stats])
+        })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -186,9 +179,7 @@ def handle_alerts():
             if status:
                 query = query.filter_by(status=status)
             
-            alerts = query.order_by(Alert.created_at.desc()).all()
-            
-            return jsonify([{
+            return paginate(query, [Alert.created_at, Alert.id], lambda a: {
                 'id': a.id,
                 'type': a.type,
                 'title': a.title,
@@ -197,7 +188,7 @@ def handle_alerts():
                 'status': a.status,
                 'createdAt': a.created_at.isoformat() if a.created_at else None,
                 'resolvedAt': a.resolved_at.isoformat() if a.resolved_at else None
-            } for a in alerts])
+            }, descending=True)
         
         elif request.method == 'POST':
             data = request.get_json()
@@ -236,8 +227,7 @@ def resolve_alert(id):
 def handle_customers():
     try:
         if request.method == 'GET':
-            customers = db.session.query(Customer).all()
-            return jsonify([{
+            return paginate(db.session.query(Customer), [Customer.id], lambda c: {
                 'id': c.id,
                 'trackingId': c.tracking_id,
                 'gender': c.gender,
@@ -246,7 +236,7 @@ def handle_customers():
                 'lastSeen': c.last_seen.isoformat() if c.last_seen else None,
                 'totalVisits': c.total_visits,
                 'isStaff': c.is_staff
-            } for c in customers])
+            })
         
         elif request.method == 'POST':
             data = request.get_json()
@@ -268,12 +258,19 @@ def handle_customers():
 def handle_tracking_events():
     try:
         if request.method == 'GET':
-            limit = request.args.get('limit', type=int, default=100)
-            events = db.session.query(TrackingEvent).order_by(
-                TrackingEvent.timestamp.desc()
-            ).limit(limit).all()
+            query = db.session.query(TrackingEvent)
+            # since/until bound exports to a time range so only the matching partitions are scanned
+            try:
+                since = request.args.get('since')
+                until = request.args.get('until')
+                if since:
+                    query = query.filter(TrackingEvent.timestamp >= datetime.fromisoformat(since))
+                if until:
+                    query = query.filter(TrackingEvent.timestamp < datetime.fromisoformat(until))
+            except ValueError:
+                return jsonify({'error': 'since/until must be ISO 8601 timestamps'}), 400
             
-            return jsonify([{
+            return paginate(query, [TrackingEvent.timestamp, TrackingEvent.id], lambda e: {
                 'id': e.id,
                 'customerId': e.customer_id,
                 'zoneId': e.zone_id,
@@ -281,7 +278,7 @@ def handle_tracking_events():
                 'timestamp': e.timestamp.isoformat() if e.timestamp else None,
                 'confidence': float(e.confidence) if e.confidence else None,
                 'metadata': e.event_metadata
-            } for e in events])
+            }, descending=True, default_limit=100)
         
         elif request.method == 'POST':
             data = request.get_json()
@@ -300,6 +297,44 @@ def handle_tracking_events():
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+def _bulk_request(handler):
+    # Accepts a JSON array, or NDJSON with Content-Type application/x-ndjson; one transaction per request
+    try:
+        try:
+            records = parse_records(request.get_data(), request.mimetype == 'application/x-ndjson')
+        except ValueError as e:
+            return jsonify({'error': f'Invalid body: {e}'}), 400
+        if not records:
+            return jsonify({'error': 'No records provided'}), 400
+        if len(records) > BULK_MAX_RECORDS:
+            return jsonify({'error': f'At most {BULK_MAX_RECORDS} records per request'}), 413
+        
+        results = handler(records)
+        db.session.commit()
+        
+        accepted = sum(1 for r in results if 'id' in r)
+        status = 201 if accepted == len(results) else 207 if accepted else 400
+        return jsonify({
+            'accepted': accepted,
+            'rejected': len(results) - accepted,
+            'results': results
+        }), status
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@api_bp.route('/tracking/events/bulk', methods=['POST'])
+def bulk_tracking_events():
+    return _bulk_request(insert_events)
+
+@api_bp.route('/customers/bulk', methods=['POST'])
+def bulk_customers():
+    return _bulk_request(upsert_customer_records)
+
+@api_bp.route('/alerts/bulk', methods=['POST'])
+def bulk_alerts():
+    return _bulk_request(insert_alerts)
+
 @api_bp.route('/ai/detect', methods=['POST'])
 def ai_detect():
     try:
@@ -311,7 +346,7 @@ def ai_detect():
         nparr = np.frombuffer(image_bytes, np.uint8)
         frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
         
-        detections = detector.detect_people(frame)
+        detections = detector.detect_request(frame)
         demographics = detector.analyze_demographics(detections)
         
         return jsonify({
@@ -442,7 +477,9 @@ def save_notification_settings():
 @api_bp.route('/system/status', methods=['GET'])
 def get_system_status():
     from python_backend.models.models import Camera
-    from python_backend.camera import camera_manager
+    from python_backend.camera import camera_manager, stream_encoders, result_hub
+    from python_backend.ingestion.event_writer import event_writer
+    from python_backend.background import background_services
     try:
         cameras = db.session.query(Camera).all()
         active_cameras = camera_manager.get_active_cameras()
@@ -451,7 +488,13 @@ def get_system_status():
             'totalCameras': len(cameras),
             'activeCameras': len(active_cameras),
             'databaseConnected': True,
-            'aiReady': True
+            'aiReady': True,
+            'cameras': camera_manager.health_stats(),
+            'detection': detector.executor_stats(),
+            'background': background_services.stats(),
+            'ingestion': event_writer.stats(),
+            'streams': stream_encoders.stats(),
+            'hub': result_hub.stats()
         })
     except Exception as e:
         return jsonify({
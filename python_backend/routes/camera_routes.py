@@ -1,13 +1,21 @@
+import os
+import time
 from flask import Blueprint, jsonify, request, Response
-import cv2
-import numpy as np
 from python_backend.models.models import Camera
 from python_backend.config.database import db
-from python_backend.camera import camera_manager
-from python_backend.ai_detection.detector import detector
+from python_backend.camera import camera_manager, detection_pipeline, stream_encoders, STREAM_PROFILES
+from python_backend.background import background_services
 
 camera_bp = Blueprint('camera', __name__, url_prefix='/api/cameras')
 
+CAMERA_TEST_TIMEOUT = float(os.getenv('CAMERA_TEST_TIMEOUT', 5))
+CAMERA_TEST_MAX_TIMEOUT = 30.0
+
+def _analytics_fps(value):
+    if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0):
+        raise ValueError('analyticsFps must be a non-negative number or null')
+    return value
+
 @camera_bp.route('', methods=['GET'])
 def list_cameras():
     try:
@@ -22,6 +30,9 @@ def list_cameras():
             'status': c.status,
             'isActive': c.camera_index in active_cameras,
             'rtspUrl': c.rtsp_url,
+            'substreamUrl': c.substream_url,
+            'analyticsFps': c.analytics_fps,
+            'health': camera_manager.get_health(c.camera_index),
             'createdAt': c.created_at.isoformat() if c.created_at else None
         } for c in cameras])
     except Exception as e:
@@ -35,6 +46,11 @@ def add_camera():
         camera_index = data.get('cameraIndex')
         location = data.get('location')
         rtsp_url = data.get('rtspUrl')
+        substream_url = data.get('substreamUrl')
+        try:
+            analytics_fps = _analytics_fps(data.get('analyticsFps'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         if camera_index is None:
             return jsonify({'error': 'رقم الكاميرا مطلوب'}), 400
@@ -51,13 +67,15 @@ def add_camera():
             camera_index=camera_index,
             location=location,
             rtsp_url=rtsp_url,
+            substream_url=substream_url,
+            analytics_fps=analytics_fps,
             status='active'
         )
         
         db.session.add(camera)
         db.session.commit()
         
-        camera_manager.add_camera(camera_index, rtsp_url)
+        background_services.sync_cameras()
         
         return jsonify({
             'id': camera.id,
@@ -65,7 +83,9 @@ def add_camera():
             'cameraIndex': camera.camera_index,
             'location': camera.location,
             'status': camera.status,
-            'rtspUrl': camera.rtsp_url
+            'rtspUrl': camera.rtsp_url,
+            'substreamUrl': camera.substream_url,
+            'analyticsFps': camera.analytics_fps
         }), 201
     except Exception as e:
         db.session.rollback()
@@ -78,9 +98,9 @@ def delete_camera(camera_id):
         if not camera:
             return jsonify({'error': 'Camera not found'}), 404
         
-        camera_manager.remove_camera(camera.camera_index)
         db.session.delete(camera)
         db.session.commit()
+        background_services.sync_cameras()
         
         return jsonify({'success': True, 'message': 'Camera deleted successfully'})
     except Exception as e:
@@ -103,21 +123,20 @@ def update_camera(camera_id):
             camera.location = data['location']
         if 'status' in data:
             camera.status = data['status']
-            if data['status'] == 'inactive':
-                camera_manager.remove_camera(camera.camera_index)
-            elif data['status'] == 'active':
-                camera_manager.add_camera(camera.camera_index, camera.rtsp_url)
-        if 'rtspUrl' in data:
-            old_rtsp = camera.rtsp_url
-            camera.rtsp_url = data['rtspUrl']
-            if old_rtsp != data['rtspUrl']:
-                camera_manager.remove_camera(camera.camera_index)
-                if camera.status == 'active':
-                    success = camera_manager.add_camera(camera.camera_index, data['rtspUrl'])
-                    if not success:
-                        return jsonify({'error': 'Failed to connect to new camera URL'}), 500
+        if 'analyticsFps' in data:
+            try:
+                camera.analytics_fps = _analytics_fps(data['analyticsFps'])
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+        if 'rtspUrl' in data or 'substreamUrl' in data:
+            camera.rtsp_url = data.get('rtspUrl', camera.rtsp_url)
+            camera.substream_url = data.get('substreamUrl', camera.substream_url)
         
         db.session.commit()
+        # Status and URL changes restart or stop the capture, analytics rates apply to the running one.
+        # New URLs open in the background like any other connect; failures show in the health state.
+        # In a process without the capture, the one that has it picks the change up within seconds.
+        background_services.sync_cameras()
         
         return jsonify({
             'id': camera.id,
@@ -126,6 +145,9 @@ def update_camera(camera_id):
             'location': camera.location,
             'status': camera.status,
             'rtspUrl': camera.rtsp_url,
+            'substreamUrl': camera.substream_url,
+            'analyticsFps': camera.analytics_fps,
+            'health': camera_manager.get_health(camera.camera_index),
             'message': 'Camera updated successfully'
         })
     except Exception as e:
@@ -140,89 +162,115 @@ def test_camera_connection(camera_id):
         if not camera:
             return jsonify({'error': 'Camera not found'}), 404
         
-        is_connected = camera_manager.test_connection(camera.camera_index, camera.rtsp_url)
+        result = camera_manager.probe(camera.camera_index, camera.capture_url)
         
+        return jsonify(dict(
+            result,
+            message='Camera is connected' if result['connected'] else 'Camera connection failed'
+        ))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@camera_bp.route('/test', methods=['POST'])
+def test_cameras():
+    # Body (all optional): {"ids": [camera ids], "timeout": seconds per camera}; omitting ids tests every camera
+    try:
+        data = request.get_json(silent=True) or {}
+        ids = data.get('ids')
+        timeout = data.get('timeout', CAMERA_TEST_TIMEOUT)
+        if ids is not None and (not isinstance(ids, list) or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids)):
+            return jsonify({'error': 'ids must be a list of camera ids'}), 400
+        if isinstance(timeout, bool) or not isinstance(timeout, (int, float)) or not 0 < timeout <= CAMERA_TEST_MAX_TIMEOUT:
+            return jsonify({'error': f'timeout must be a number of seconds up to {CAMERA_TEST_MAX_TIMEOUT:g}'}), 400
+        
+        query = db.session.query(Camera)
+        if ids is not None:
+            query = query.filter(Camera.id.in_(ids))
+        cameras = query.order_by(Camera.id).all()
+        
+        started = time.monotonic()
+        results = camera_manager.probe_many([(c.camera_index, c.capture_url) for c in cameras], float(timeout))
+        
+        missing = sorted(set(ids or []) - {c.id for c in cameras})
         return jsonify({
-            'connected': is_connected,
-            'message': 'Camera is connected' if is_connected else 'Camera connection failed'
+            'total': len(cameras),
+            'connected': sum(1 for r in results.values() if r['connected']),
+            'elapsedMs': round((time.monotonic() - started) * 1000, 1),
+            'missing': missing,
+            'results': [dict(
+                results[c.camera_index],
+                id=c.id,
+                name=c.name,
+                cameraIndex=c.camera_index
+            ) for c in cameras]
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@camera_bp.route('/profiles', methods=['GET'])
+def list_stream_profiles():
+    return jsonify([{
+        'name': name,
+        'width': settings['width'],
+        'quality': settings['quality'],
+        'fps': settings['fps']
+    } for name, settings in STREAM_PROFILES.items()])
+
 @camera_bp.route('/<int:camera_index>/stream', methods=['GET'])
 def stream_camera(camera_index):
-    def generate():
-        while True:
-            frame = camera_manager.get_frame(camera_index)
-            if frame is None:
-                break
-            
-            detections = detector.detect_people(frame)
-            
-            for det in detections:
-                x1, y1, x2, y2 = int(det['x1']), int(det['y1']), int(det['x2']), int(det['y2'])
-                
-                color = (0, 255, 255)
-                if det.get('is_staff'):
-                    color = (255, 0, 255)
-                
-                cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
-                
-                label = f"{det.get('gender', 'Unknown')} {det.get('age_range', '')}"
-                cv2.putText(frame, label, (x1, y1 - 10), 
-                          cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
-            
-            ret, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 85])
-            if not ret:
-                continue
-                
-            frame_bytes = buffer.tobytes()
-            yield (b'--frame\r\n'
-                   b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
-    
     if not camera_manager.is_camera_active(camera_index):
         return jsonify({'error': 'Camera not active'}), 404
     
+    try:
+        # ?profile=thumbnail for grid tiles, full for a focused view; viewers of a profile share its encodes
+        encoder = stream_encoders.get(camera_index, request.args.get('profile'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    def generate():
+        for encoded in encoder.frames(lambda: camera_manager.is_camera_active(camera_index)):
+            yield (b'--frame\r\n'
+                   b'Content-Type: image/jpeg\r\n\r\n' + encoded.jpeg + b'\r\n')
+    
     return Response(generate(),
                    mimetype='multipart/x-mixed-replace; boundary=frame')
 
 @camera_bp.route('/<int:camera_index>/snapshot', methods=['GET'])
 def get_snapshot(camera_index):
     try:
-        frame = camera_manager.get_frame(camera_index)
-        if frame is None:
+        if not camera_manager.is_camera_active(camera_index):
             return jsonify({'error': 'No frame available'}), 404
         
-        detections = detector.detect_people(frame)
-        demographics = detector.analyze_demographics(detections)
-        
-        for det in detections:
-            x1, y1, x2, y2 = int(det['x1']), int(det['y1']), int(det['x2']), int(det['y2'])
-            color = (0, 255, 255) if not det.get('is_staff') else (255, 0, 255)
-            cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+        try:
+            encoder = stream_encoders.get(camera_index, request.args.get('profile'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        ret, buffer = cv2.imencode('.jpg', frame)
-        if not ret:
-            return jsonify({'error': 'Failed to encode frame'}), 500
+        detection_pipeline.wait_for_result(camera_index, timeout=2.0)
+        encoded = encoder.snapshot(timeout=2.0)
+        if encoded is None:
+            return jsonify({'error': 'No frame available'}), 404
         
-        return Response(buffer.tobytes(), mimetype='image/jpeg')
+        return Response(encoded.jpeg, mimetype='image/jpeg')
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @camera_bp.route('/<int:camera_index>/detect', methods=['GET'])
 def detect_on_camera(camera_index):
     try:
-        frame = camera_manager.get_frame(camera_index)
-        if frame is None:
+        if not camera_manager.is_camera_active(camera_index):
             return jsonify({'error': 'No frame available'}), 404
         
-        detections = detector.detect_people(frame)
-        demographics = detector.analyze_demographics(detections)
+        result = detection_pipeline.wait_for_result(camera_index, timeout=2.0)
+        if result is None:
+            return jsonify({'error': 'No frame available'}), 404
         
         return jsonify({
-            'detections': detections,
-            'demographics': demographics,
-            'count': len(detections)
+            'frameId': result['frameId'],
+            'detections': result['detections'],
+            'demographics': result['demographics'],
+            'zones': result.get('zones', {}),
+            'count': len(result['detections'])
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
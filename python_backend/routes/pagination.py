@@ -0,0 +1,53 @@
+import json
+import os
+from datetime import datetime
+from typing import Callable, Dict, List
+from flask import Response, jsonify, request, stream_with_context
+from sqlalchemy import tuple_
+
+DEFAULT_PAGE_SIZE = int(os.getenv('API_DEFAULT_PAGE_SIZE', 1000))
+MAX_PAGE_SIZE = int(os.getenv('API_MAX_PAGE_SIZE', 1000))
+STREAM_BATCH_SIZE = int(os.getenv('API_STREAM_BATCH_SIZE', 1000))
+
+def _encode(row, columns) -> str:
+    values = [getattr(row, column.key) for column in columns]
+    return ','.join(v.isoformat() if isinstance(v, datetime) else str(v) for v in values)
+
+def _decode(cursor: str, columns) -> List:
+    parts = cursor.split(',')
+    if len(parts) != len(columns):
+        raise ValueError('Invalid cursor')
+    return [datetime.fromisoformat(part) if column.type.python_type is datetime else int(part)
+            for part, column in zip(parts, columns)]
+
+def wants_stream() -> bool:
+    return request.args.get('format') == 'ndjson' or request.accept_mimetypes.best == 'application/x-ndjson'
+
+def paginate(query, columns, serialize: Callable[[object], Dict], descending: bool = False,
+             default_limit: int = DEFAULT_PAGE_SIZE):
+    # Keyset pagination over `columns` (unique together, indexed); the next page starts after X-Next-Cursor.
+    # With ?format=ndjson the whole result is streamed one JSON object per line from a server-side cursor.
+    cursor = request.args.get('after')
+    if cursor:
+        try:
+            values = _decode(cursor, columns)
+        except ValueError:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        key = tuple_(*columns)
+        query = query.filter(key < tuple_(*values) if descending else key > tuple_(*values))
+    query = query.order_by(*[column.desc() if descending else column.asc() for column in columns])
+
+    limit = request.args.get('limit', type=int)
+    if wants_stream():
+        if limit:
+            query = query.limit(limit)
+        rows = query.yield_per(STREAM_BATCH_SIZE)
+        lines = (json.dumps(serialize(row)) + '\n' for row in rows)
+        return Response(stream_with_context(lines), mimetype='application/x-ndjson')
+
+    limit = max(1, min(limit or default_limit, MAX_PAGE_SIZE))
+    rows = query.limit(limit + 1).all()
+    response = jsonify([serialize(row) for row in rows[:limit]])
+    if len(rows) > limit:
+        response.headers['X-Next-Cursor'] = _encode(rows[limit - 1], columns)
+    return response
@@ -2,59 +2,102 @@ import json
 import time
 from flask import request
 from flask_sock import Sock
-from python_backend.camera import camera_manager
-from python_backend.ai_detection.detector import detector
+from python_backend.camera import camera_manager, detection_pipeline, result_hub, STREAM_PROFILES
+from python_backend.camera.stream_encoder import resolve_profile, profile_scale
+from python_backend.ai_detection.tracker import SESSION
+from python_backend.routes.ws_protocol import SUBPROTOCOLS, negotiate, hello
 
 sock = Sock()
 
+def scale_detections(detections, scale):
+    if scale == 1.0:
+        return detections
+    return [dict(det, bbox={key: int(value * scale) for key, value in det['bbox'].items()}) for det in detections]
+
+def status_message(camera_index, message):
+    return json.dumps({
+        'type': 'status',
+        'message': message,
+        'cameraIndex': camera_index
+    })
+
+def open_session(args, subprotocol):
+    # ?profile= matches the stream profile the client displays: boxes are scaled to its
+    # resolution and messages are capped at its frame rate (and at ?maxFps= if lower).
+    # ?protocol= or the Sec-WebSocket-Protocol header picks the message format, see ws_protocol.
+    # Shared by the Flask route below and the ASGI runtime; raises ValueError for bad parameters.
+    profile = resolve_profile(args.get('profile'))
+    encoder = negotiate(args.get('protocol'), subprotocol)
+    try:
+        requested_fps = float(args.get('maxFps') or 0) or float('inf')
+    except ValueError:
+        requested_fps = float('inf')
+    max_fps = min(STREAM_PROFILES[profile]['fps'], requested_fps)
+    if max_fps <= 0:
+        raise ValueError('maxFps must be positive')
+    return profile, encoder, max_fps
+
+def render(result, encoder, profile):
+    # None when the encoder has nothing new to say about this result
+    frame_size = result.get('frameSize') or {'width': 0, 'height': 0}
+    scale = profile_scale(profile, frame_size['width'])
+    return encoder.encode(
+        result,
+        scale_detections(result['detections'], scale),
+        {key: int(value * scale) for key, value in frame_size.items()},
+        profile
+    )
+
 def init_websocket(app):
+    app.config.setdefault('SOCK_SERVER_OPTIONS', {}).setdefault('subprotocols', list(SUBPROTOCOLS))
     sock.init_app(app)
     
     @sock.route('/ws/camera/<int:camera_index>')
     def camera_websocket(ws, camera_index):
+        subscription = None
         try:
             # Check if camera exists, if not send a status message and close
             if not camera_manager.is_camera_active(camera_index):
-                ws.send(json.dumps({
-                    'type': 'status',
-                    'message': f'Camera {camera_index} not available',
-                    'cameraIndex': camera_index
-                }))
+                ws.send(status_message(camera_index, f'Camera {camera_index} not available'))
                 return
             
-            frame_skip = 0
-            send_count = 0
+            try:
+                profile, encoder, max_fps = open_session(request.args, ws.subprotocol)
+            except ValueError as e:
+                ws.send(status_message(camera_index, str(e)))
+                return
+            interval = 1.0 / max_fps
+            ws.send(hello(encoder, camera_index, profile, max_fps, SESSION))
             
-            while True:
-                frame = camera_manager.get_frame(camera_index)
-                if frame is None:
-                    send_count += 1
-                    if send_count > 30:  # Send status every ~3 seconds
-                        ws.send(json.dumps({
-                            'type': 'status',
-                            'message': 'Waiting for frame',
-                            'cameraIndex': camera_index
-                        }))
-                        send_count = 0
-                    continue
+            # Results reach this connection through its own bounded queue on the shared hub
+            subscription = result_hub.subscribe(camera_index)
+            current = detection_pipeline.get_result(camera_index)
+            if current is not None:
+                subscription.put(current)
+            
+            last_sent = 0.0
+            
+            while ws.connected and camera_manager.is_camera_active(camera_index):
+                # Results queued during this pause are skipped; only the newest one is sent
+                wait = last_sent + interval - time.monotonic()
+                if wait > 0:
+                    time.sleep(wait)
                 
-                # Skip frames to reduce processing
-                frame_skip = (frame_skip + 1) % 5
-                if frame_skip != 0:
+                result = subscription.get(timeout=3.0, latest=True)
+                if not ws.connected:
+                    break
+                if result is None:
+                    ws.send(status_message(camera_index, 'Waiting for frame'))
                     continue
-                    
-                detections = detector.detect_people(frame)
-                demographics = detector.analyze_demographics(detections)
                 
-                data = {
-                    'type': 'detection',
-                    'cameraIndex': camera_index,
-                    'detections': detections,
-                    'demographics': demographics,
-                    'timestamp': time.time()
-                }
+                message = render(result, encoder, profile)
+                if message is None:
+                    continue
                 
-                ws.send(json.dumps(data))
-                send_count = 0
+                ws.send(message)
+                last_sent = time.monotonic()
         except Exception as e:
             print(f"WebSocket error: {e}")
+        finally:
+            if subscription is not None:
+                result_hub.unsubscribe(subscription)
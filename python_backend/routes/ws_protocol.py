@@ -0,0 +1,171 @@
+import json
+import os
+import struct
+import time
+from typing import Dict, List, Optional, Union
+
+# Detection message protocols for /ws/camera/<idx>, chosen with ?protocol= or the Sec-WebSocket-Protocol header:
+#   json        full JSON document per processed frame (the original format, default)
+#   json-delta  JSON text with track deltas: {'type': 'delta' | 'keyframe', added, updated, removed, ...}
+#   binary      the same deltas struct-packed, little-endian:
+#     header   <BBBHIdHHHHH  version, kind (1 delta, 2 keyframe), flags (1 demographics, 2 zones),
+#                            cameraIndex, frameId, timestamp, frame width, frame height, #added, #updated, #removed
+#     added    <IhhHHBBBB    trackId, x, y, width, height, confidence * 100, gender code, age code, isStaff
+#     updated  <IhhHH        trackId, x, y, width, height
+#     removed  <I            trackId
+#     then, for each flag set: <I byte length followed by UTF-8 JSON (demographics, then zones)
+# Delta messages are skipped when nothing changed; keyframes carry the full state and resync late joiners.
+# Code tables (genders, age ranges) and the tracking id format are sent in the initial 'hello' message.
+
+SUBPROTOCOLS = {'dvs.json.v1': 'json', 'dvs.json-delta.v1': 'json-delta', 'dvs.binary.v1': 'binary'}
+KEYFRAME_SECONDS = float(os.getenv('WS_KEYFRAME_SECONDS', 10))
+BINARY_VERSION = 1
+
+GENDERS = [None, 'Male', 'Female']
+AGE_RANGES = ['0-12', '13-19', '20-35', '36-50', '51-70', '70+']
+
+_HEADER = struct.Struct('<BBBHIdHHHHH')
+_ADDED = struct.Struct('<IhhHHBBBB')
+_UPDATED = struct.Struct('<IhhHH')
+_REMOVED = struct.Struct('<I')
+_LENGTH = struct.Struct('<I')
+
+def _box(det: Dict) -> tuple:
+    bbox = det['bbox']
+    return bbox['x'], bbox['y'], bbox['width'], bbox['height']
+
+class FullJsonEncoder:
+    name = 'json'
+
+    def encode(self, result: Dict, detections: List[Dict], frame_size: Dict, profile: str) -> Optional[str]:
+        return json.dumps({
+            'type': 'detection',
+            'cameraIndex': result['cameraIndex'],
+            'profile': profile,
+            'frameId': result['frameId'],
+            'frameSize': frame_size,
+            'detections': detections,
+            'demographics': result['demographics'],
+            'zones': result.get('zones', {}),
+            'timestamp': result['timestamp']
+        })
+
+class DeltaEncoder:
+    # Per-connection state: what this client last received, keyed by stable track id
+    def __init__(self):
+        self.boxes: Dict[int, tuple] = {}
+        self.demographics = None
+        self.zones = None
+        self.last_keyframe = 0.0
+
+    def diff(self, result: Dict, detections: List[Dict]) -> Optional[Dict]:
+        now = time.monotonic()
+        keyframe = now - self.last_keyframe >= KEYFRAME_SECONDS
+        current = {det['track_id']: det for det in detections}
+
+        if keyframe:
+            added, updated, removed = list(current.values()), [], []
+            self.last_keyframe = now
+        else:
+            added = [det for track_id, det in current.items() if track_id not in self.boxes]
+            updated = [det for track_id, det in current.items()
+                       if track_id in self.boxes and self.boxes[track_id] != _box(det)]
+            removed = [track_id for track_id in self.boxes if track_id not in current]
+
+        zones = result.get('zones', {})
+        demographics = result['demographics'] if keyframe or result['demographics'] != self.demographics else None
+        zones_changed = keyframe or zones != self.zones
+        if not (keyframe or added or updated or removed or demographics is not None or zones_changed):
+            return None
+
+        self.boxes = {track_id: _box(det) for track_id, det in current.items()}
+        self.demographics = result['demographics']
+        self.zones = zones
+        return {
+            'keyframe': keyframe,
+            'added': added,
+            'updated': updated,
+            'removed': removed,
+            'demographics': demographics,
+            'zones': zones if zones_changed else None
+        }
+
+class JsonDeltaEncoder(DeltaEncoder):
+    name = 'json-delta'
+
+    def encode(self, result: Dict, detections: List[Dict], frame_size: Dict, profile: str) -> Optional[str]:
+        delta = self.diff(result, detections)
+        if delta is None:
+            return None
+        message = {
+            'type': 'keyframe' if delta['keyframe'] else 'delta',
+            'cameraIndex': result['cameraIndex'],
+            'frameId': result['frameId'],
+            'timestamp': result['timestamp'],
+            'added': delta['added'],
+            'updated': [{'trackId': det['track_id'], 'bbox': det['bbox']} for det in delta['updated']],
+            'removed': delta['removed']
+        }
+        if delta['keyframe']:
+            message['profile'] = profile
+            message['frameSize'] = frame_size
+        if delta['demographics'] is not None:
+            message['demographics'] = delta['demographics']
+        if delta['zones'] is not None:
+            message['zones'] = delta['zones']
+        return json.dumps(message, separators=(',', ':'))
+
+class BinaryDeltaEncoder(DeltaEncoder):
+    name = 'binary'
+
+    def encode(self, result: Dict, detections: List[Dict], frame_size: Dict, profile: str) -> Optional[bytes]:
+        delta = self.diff(result, detections)
+        if delta is None:
+            return None
+        flags = (1 if delta['demographics'] is not None else 0) | (2 if delta['zones'] is not None else 0)
+        parts = [_HEADER.pack(
+            BINARY_VERSION, 2 if delta['keyframe'] else 1, flags,
+            result['cameraIndex'], result['frameId'], result['timestamp'],
+            frame_size['width'], frame_size['height'],
+            len(delta['added']), len(delta['updated']), len(delta['removed'])
+        )]
+        for det in delta['added']:
+            gender = det.get('gender')
+            age = det.get('age_range')
+            parts.append(_ADDED.pack(
+                det['track_id'], *_box(det),
+                min(int(round((det.get('confidence') or 0) * 100)), 255),
+                GENDERS.index(gender) if gender in GENDERS else 0,
+                AGE_RANGES.index(age) if age in AGE_RANGES else 255,
+                1 if det.get('is_staff') else 0
+            ))
+        parts.extend(_UPDATED.pack(det['track_id'], *_box(det)) for det in delta['updated'])
+        parts.extend(_REMOVED.pack(track_id) for track_id in delta['removed'])
+        for blob in (delta['demographics'], delta['zones']):
+            if blob is not None:
+                data = json.dumps(blob, separators=(',', ':')).encode()
+                parts.append(_LENGTH.pack(len(data)) + data)
+        return b''.join(parts)
+
+ENCODERS = {'json': FullJsonEncoder, 'json-delta': JsonDeltaEncoder, 'binary': BinaryDeltaEncoder}
+
+def negotiate(requested: Optional[str], subprotocol: Optional[str]) -> Union[FullJsonEncoder, DeltaEncoder]:
+    name = requested or SUBPROTOCOLS.get(subprotocol or '', 'json')
+    if name not in ENCODERS:
+        raise ValueError(f"Unknown protocol '{name}', expected one of: {', '.join(ENCODERS)}")
+    return ENCODERS[name]()
+
+def hello(encoder, camera_index: int, profile: str, max_fps: float, session: str) -> str:
+    return json.dumps({
+        'type': 'hello',
+        'cameraIndex': camera_index,
+        'protocol': encoder.name,
+        'protocols': list(ENCODERS),
+        'profile': profile,
+        'maxFps': max_fps,
+        'binaryVersion': BINARY_VERSION,
+        'trackingIdFormat': f'c{camera_index}-{session}-{{trackId}}',
+        'genders': GENDERS,
+        'ageRanges': AGE_RANGES,
+        'keyframeSeconds': KEYFRAME_SECONDS
+    })
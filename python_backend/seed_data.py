@@ -5,16 +5,18 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from datetime import datetime, timedelta
 import random
 from python_backend.app import create_app
-from python_backend.models.models import Zone, Customer, Visit, Alert, ZoneStats, TrackingEvent, Camera
+from python_backend.models.models import Zone, Customer, Visit, Alert, ZoneStats, TrackingEvent, Camera, StoreHourlyStats
 from python_backend.config.database import db
+from python_backend.analytics.rollups import rebuild_store_rollups
 
 def seed_database():
-    app = create_app()
+    app = create_app(background=False)
     
     with app.app_context():
         print("Clearing existing data...")
         TrackingEvent.query.delete()
         ZoneStats.query.delete()
+        StoreHourlyStats.query.delete()
         Visit.query.delete()
         Alert.query.delete()
         Customer.query.delete()
@@ -115,13 +117,7 @@ def seed_database():
         )
         db.session.add(camera)
         db.session.commit()
-        
-        from python_backend.camera import camera_manager
-        try:
-            camera_manager.add_camera(0)
-            print("Created and activated camera")
-        except Exception as e:
-            print(f"Camera created in DB but couldn't activate (normal if no physical camera): {e}")
+        print("Created camera; the app connects it on start")
         
         print("Creating zone stats...")
         for zone in zones:
@@ -138,6 +134,9 @@ def seed_database():
                         db.session.add(stat)
         
         db.session.commit()
+        
+        print("Building hourly rollups...")
+        rebuild_store_rollups(datetime.utcnow() - timedelta(days=3), datetime.utcnow() + timedelta(hours=1))
         print("Database seeding completed!")
 
 if __name__ == '__main__':